@@ -0,0 +1,94 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from process_goodreads import process_library
+from utils import instrumentation
+from utils.bulk_lookup import prefetch_volumes
+from utils.cache import close_cache, share_fetch_claims
+from utils.cover_mirror import share_manifest_lock
+from utils.data_loader import iter_export_chunks
+from utils.http_client import share_rate_limits
+from utils.replay import install_replay
+
+def load_jobs(args):
+    """Collect (export, data dir, output) triples from --job arguments and a --jobs JSON file."""
+    jobs = [tuple(job) for job in args.job or []]
+    if args.jobs:
+        with open(args.jobs, 'r', encoding='utf-8') as f:
+            jobs += [(job['export'], job.get('data_dir', 'data'), job['output']) for job in json.load(f)]
+    outputs = [os.path.abspath(output) for _, _, output in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError('Every job needs its own output path')
+    return jobs
+
+def report_path(output_path):
+    """Run report location for one library: <output stem>.run_report.json next to its stats."""
+    return f"{os.path.splitext(output_path)[0]}.run_report.json"
+
+def prefetch_shared(jobs):
+    """Bulk-resolve the ISBNs of all exports at once, so books shared by several readers are looked up once."""
+    books = {}
+    for export, _, _ in jobs:
+        for chunk in iter_export_chunks(export):
+            for book in chunk[['Book Id', 'ISBN', 'ISBN13']].to_dict(orient='records'):
+                books.setdefault(book['Book Id'], book)
+    logging.info(f"Prefetching {len(books)} distinct books from {len(jobs)} exports")
+    prefetch_volumes(list(books.values()))
+
+def _init_worker(rate_state, rate_lock, claims, claims_lock, manifest_lock):
+    install_replay()
+    share_rate_limits(rate_state, rate_lock)
+    share_fetch_claims(claims, claims_lock)
+    share_manifest_lock(manifest_lock)
+
+def _run_job(export, data_dir, output, full, time_budget):
+    instrumentation.reset()
+    try:
+        return process_library(export, data_dir, output, full, time_budget)
+    finally:
+        instrumentation.write_report(report_path(output))
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate stats for several Goodreads exports in parallel worker processes.')
+    parser.add_argument('--job', nargs=3, action='append', metavar=('EXPORT', 'DATA_DIR', 'OUTPUT'), help='One library: export CSV, mappings directory, stats output (repeatable)')
+    parser.add_argument('--jobs', help='JSON file with a list of {"export", "data_dir", "output"} objects')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes (default: CPU count)')
+    parser.add_argument('--full', action='store_true', help='Re-enrich every book instead of only new or changed rows')
+    parser.add_argument('--time-budget', type=float, help='Minutes each library may spend enriching before it is checkpointed for the next run')
+    args = parser.parse_args()
+    jobs = load_jobs(args)
+    if not jobs:
+        parser.error('no jobs given (use --job or --jobs)')
+
+    install_replay()
+    # Workers are spawned, not forked, so none inherits the parent's SQLite connection or HTTP pool
+    context = multiprocessing.get_context('spawn')
+    failed = 0
+    with context.Manager() as manager:
+        # One rate limit per host and one fetch per cache key across all workers
+        rate_state, rate_lock = manager.dict(), manager.Lock()
+        claims, claims_lock = manager.dict(), manager.Lock()
+        # Libraries written to the same directory share its cover manifest
+        manifest_lock = manager.Lock()
+        share_rate_limits(rate_state, rate_lock)
+        prefetch_shared(jobs)
+        close_cache()
+
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs)), mp_context=context, initializer=_init_worker, initargs=(rate_state, rate_lock, claims, claims_lock, manifest_lock)) as executor:
+            futures = {executor.submit(_run_job, export, data_dir, output, args.full, args.time_budget): export for export, data_dir, output in jobs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                    logging.info(f"Finished {futures[future]} -> {result}" if result else f"Checkpointed {futures[future]}, to be resumed")
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"Failed to process {futures[future]}: {e}")
+    logging.info(f"Processed {len(jobs) - failed} of {len(jobs)} libraries")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
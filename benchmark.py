@@ -0,0 +1,210 @@
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter
+import numpy as np
+import pandas as pd
+from process_goodreads import enrich_book
+from utils import cover_mirror, http_client, instrumentation
+from utils.api_fetch import clear_page_memo
+from utils.bulk_lookup import prefetch_volumes
+from utils.cache import close_cache, configure_cache
+from utils.data_loader import load_and_preprocess_data, load_mappings
+from utils.incremental import ENRICHED_COLUMNS, compute_row_hashes
+from utils.normalization import MappingIndex
+from utils.replay import build_response, install_replay
+from utils.stats_generator import build_stats, write_stats
+from utils.volume_resolver import clear_memo
+
+STAGES = ['load', 'prefetch', 'enrich', 'annotate', 'genres', 'covers', 'mirror', 'stats']
+# Recorded by instrumentation.stage inside enrich_book; summed over the worker threads, so they can exceed enrich
+ENRICH_PARTS = ['annotate', 'genres', 'covers']
+GENRES = ['Fiction', 'Fantasy', 'Science Fiction', 'Classics', 'Historical Fiction', 'Mystery', 'Nonfiction', 'Horror']
+
+def generate_library(template_path, rows, output_path):
+    """Write a synthetic export of `rows` rows by cycling the template CSV with unique Book Ids, titles and ISBNs."""
+    template = pd.read_csv(template_path, dtype=str, keep_default_na=False)
+    df = template.iloc[np.resize(np.arange(len(template)), rows)].reset_index(drop=True)
+    numbers = pd.Series(np.arange(rows)).astype(str)
+    df['Book Id'] = (10_000_000 + np.arange(rows)).astype(str)
+    df['Title'] = numbers.str.cat(df['Title'], sep='. ')
+    # Keep rows without ISBNs in the template without ISBNs, as in real exports
+    df['ISBN'] = np.where(df['ISBN'] != '=""', '="' + numbers.str.zfill(9) + 'X"', df['ISBN'])
+    df['ISBN13'] = np.where(df['ISBN13'] != '=""', '="979' + numbers.str.zfill(10) + '"', df['ISBN13'])
+    df.to_csv(output_path, index=False, encoding='utf-8')
+
+def _png(seed):
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'\x89PNG\r\n\x1a\n'
+    buffer = io.BytesIO()
+    Image.new('RGB', (128, 192), (seed % 256, 90, 160)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+class SyntheticResponder:
+    """Deterministic stand-in for Goodreads, Google Books, Open Library and image hosts.
+
+    Roughly two thirds of Google Books lookups find a volume and half of the Open Library
+    bibkeys have a record, so the fallback chains of the real pipeline are exercised.
+    """
+
+    def __init__(self, page_kb=100):
+        # Real book pages are mostly markup around the two blocks the parser needs
+        self.filler = ('<div class="filler">' + 'x' * 1000 + '</div>') * (page_kb // 2)
+        self.images = [_png(seed) for seed in range(8)]
+        self.hosts = Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _found(text, share):
+        return zlib.crc32(text.encode('utf-8')) % 100 < share
+
+    def _volumes(self, query):
+        if not self._found(query, 66):
+            return {'totalItems': 0}
+        checksum = zlib.crc32(query.encode('utf-8'))
+        volume = {
+            'categories': [GENRES[checksum % len(GENRES)]],
+            'description': f"Google Books description for {query}.",
+            'imageLinks': {'thumbnail': f"http://books.google.com/books/content?id={checksum}&printsec=frontcover&img=1&zoom=1"} if checksum % 4 else {}
+        }
+        return {'totalItems': 1, 'items': [{'volumeInfo': volume}]}
+
+    def _goodreads_page(self, book_id):
+        checksum = zlib.crc32(book_id.encode('utf-8'))
+        genres = ''.join(
+            f'<a class="Button Button--tag" href="#"><span class="Button__labelItem">{GENRES[(checksum + i) % len(GENRES)]}</span></a>'
+            for i in range(3)
+        )
+        return (
+            f'<html><head><meta property="og:image" content="https://images.gr-assets.com/books/{checksum}.jpg"></head><body>'
+            + self.filler
+            + f'<div data-testid="description"><span class="Formatted">Goodreads description of book {book_id}.</span></div>'
+            + f'<div data-testid="genresList"><span>{genres}</span></div>'
+            + self.filler
+            + '</body></html>'
+        )
+
+    def _batch(self, url, data, headers):
+        boundary = 'batch_response'
+        parts = []
+        for content_id, query in re.findall(r'Content-ID: <item(\d+)>\r\n\r\nGET /books/v1/volumes\?q=([^&\s]+)', data.decode('utf-8')):
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-item{content_id}>\r\n\r\n"
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(self._volumes(query))}\r\n"
+            )
+        body = ''.join(parts) + f"--{boundary}--\r\n"
+        return build_response(url, 200, body, f'multipart/mixed; boundary={boundary}')
+
+    def __call__(self, method, url, headers=None, data=None, **kwargs):
+        parts = urllib.parse.urlsplit(url)
+        with self.lock:
+            self.hosts[parts.hostname] += 1
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        if parts.hostname == 'www.goodreads.com':
+            return build_response(url, 200, self._goodreads_page(parts.path.rsplit('/', 1)[-1]))
+        if parts.path.startswith('/batch/'):
+            return self._batch(url, data, headers)
+        if parts.path.endswith('/volumes'):
+            return build_response(url, 200, json.dumps(self._volumes(query['q'])), 'application/json; charset=UTF-8')
+        if parts.path == '/api/books':
+            bibkeys = [key for key in query['bibkeys'].split(',') if self._found(key, 50)]
+            records = {key: {'details': {'description': f"Open Library description for {key}.", 'covers': [zlib.crc32(key.encode('utf-8'))]}} for key in bibkeys}
+            return build_response(url, 200, json.dumps(records), 'application/json')
+        return build_response(url, 200, self.images[zlib.crc32(url.encode('utf-8')) % len(self.images)], 'image/png')
+
+def _timed(timings, stage, func):
+    start = time.perf_counter()
+    result = func()
+    timings[stage] = time.perf_counter() - start
+    return result
+
+def run_pipeline(csv_path, work_dir):
+    """Run every pipeline stage against csv_path, with the cache and outputs inside work_dir; returns {stage: seconds}."""
+    configure_cache(os.path.join(work_dir, 'enrichment_cache.sqlite'))
+    clear_memo()
+    clear_page_memo()
+    instrumentation.reset()
+    timings = {}
+
+    def load():
+        correct_ids, series_mapping, genre_translation, excluded_genres, author_mapping, custom_genres = load_mappings()
+        mapping_index = MappingIndex(genre_translation, excluded_genres, custom_genres, series_mapping, author_mapping)
+        df = load_and_preprocess_data(csv_path, mapping_index)
+        df['Row Hash'] = compute_row_hashes(df, mapping_index, correct_ids)
+        return df, correct_ids, mapping_index
+
+    df, correct_ids, mapping_index = _timed(timings, 'load', load)
+    books = df.to_dict(orient='records')
+    _timed(timings, 'prefetch', lambda: prefetch_volumes(books))
+
+    # The real per-book enrichment from process_goodreads, so changes to it show up here
+    enriched = _timed(timings, 'enrich', lambda: http_client.run_concurrently(lambda row: enrich_book(row, correct_ids, mapping_index), books))
+    for col in ENRICHED_COLUMNS:
+        df[col] = [result[col] for result in enriched]
+    stages = instrumentation.build_report()['stages']
+    timings.update({part: stages.get(part, 0.0) for part in ENRICH_PARTS})
+    df['Cover URL'] = _timed(timings, 'mirror', lambda: cover_mirror.mirror_covers(df['Cover URL'], work_dir))
+    _timed(timings, 'stats', lambda: write_stats(build_stats(df), os.path.join(work_dir, 'reading_stats.json')))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each pipeline stage on synthetic libraries with replayed HTTP responses.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000], help='Synthetic library sizes (rows)')
+    parser.add_argument('--csv', help='Benchmark this export instead of synthetic libraries (e.g. goodreads_library_export.csv)')
+    parser.add_argument('--template', default='goodreads_library_export.csv', help='Export whose rows seed the synthetic libraries')
+    parser.add_argument('--fixtures', help='Replay recorded fixtures from this directory; requests without one get synthetic responses')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--page-kb', type=int, default=100, help='Approximate size of synthetic Goodreads pages')
+    parser.add_argument('--rate-limits', action='store_true', help='Keep the per-host rate limits of utils.http_client')
+    parser.add_argument('--output', help='Also write the results as JSON to this path')
+    parser.add_argument('--log-level', default='ERROR', help='Logging level while the pipeline runs')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    responder = SyntheticResponder(args.page_kb)
+    transport = install_replay('replay', args.fixtures, args.latency, args.error_rate, fallback=responder)
+    if not args.rate_limits:
+        http_client.configure_rate_limits({}, (1e6, 1_000_000))
+
+    runs = [(args.csv, None)] if args.csv else [(None, size) for size in args.sizes]
+    results = []
+    for csv_path, size in runs:
+        with tempfile.TemporaryDirectory(prefix='goodreads-bench-') as work_dir:
+            if csv_path is None:
+                csv_path = os.path.join(work_dir, 'library.csv')
+                generate_library(args.template, size, csv_path)
+            responder.hosts.clear()
+            counts_before = dict(transport.counts)
+            start = time.perf_counter()
+            timings = run_pipeline(csv_path, work_dir)
+            total = time.perf_counter() - start
+            close_cache()
+        results.append({
+            'rows': size or len(pd.read_csv(csv_path, usecols=['Book Id'])),
+            'stages': {stage: round(timings[stage], 4) for stage in STAGES},
+            'total': round(total, 4),
+            'requests': {name: transport.counts[name] - counts_before[name] for name in transport.counts},
+            'synthetic_requests_by_host': dict(responder.hosts),
+        })
+
+    print(f"{'rows':>8} " + ' '.join(f"{stage:>9}" for stage in STAGES) + f" {'total':>9} {'requests':>9}")
+    for result in results:
+        requests_sent = result['requests']['replayed'] + result['requests']['fallback'] + result['requests']['injected_errors']
+        print(f"{result['rows']:>8} " + ' '.join(f"{result['stages'][stage]:>9.3f}" for stage in STAGES) + f" {result['total']:>9.3f} {requests_sent:>9}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -80,7 +80,17 @@ class Book {
         return this.Genres?.slice(0, 3) || [];
     }
 
-    getAnnotation() {
+    // Annotations are loaded from their shard on first use (hover or flip)
+    async getAnnotation() {
+        if (this.Annotation === undefined) {
+            try {
+                const annotations = await loadShard('annotations');
+                this.Annotation = annotations ? annotations[this.index] : null;
+            } catch (error) {
+                console.error(`Failed to load annotation for ${this.Title}:`, error);
+                return 'Нет аннотации';
+            }
+        }
         return this.Annotation || 'Нет аннотации';
     }
 
@@ -99,7 +109,7 @@ class Book {
                     <div class="front flex flex-col justify-between w-full h-full overflow-hidden">
                         <div class="flex items-start">
                             <img src="${this.getCoverUrl()}" alt="${this.Title}" class="book-cover mr-4" 
-                                 onerror="console.error('Failed to load cover for ${this.Title}: ${this.getCoverUrl()}'); this.src='https://placehold.co/100x150?text=Нет+обложки'; this.onerror=null;">
+                                 onerror="handleCoverError(this, 'https://placehold.co/100x150?text=Нет+обложки')">
                             <div class="flex-1">
                                 <h3 class="text-lg font-semibold text-gray-800"><a href="${this.getGoodreadsBookLink()}" target="_blank" class="hover:underline">${this.Title}</a></h3>
                                 <p class="text-gray-600 text-sm">👤 ${author}</p>
@@ -116,18 +126,25 @@ class Book {
                     <!-- Back Side (Annotation) -->
                     <div class="back flex items-center justify-center w-full h-full">
                         <div class="p-1 text-center overflow-y-auto max-h-[180px] custom-scrollbar">
-                            <p class="text-gray-800 text-sm text-justify">${this.getAnnotation()}</p>
+                            <p class="annotation-text text-gray-800 text-sm text-justify">Загрузка аннотации...</p>
                         </div>
                     </div>
                 </div>
             </div>
         `;
+        // Fill in the annotation on first hover or flip
+        const annotationElement = div.querySelector('.annotation-text');
+        const showAnnotation = async () => {
+            annotationElement.innerHTML = await this.getAnnotation();
+        };
+        div.addEventListener('mouseenter', showAnnotation, { once: true });
         // Add flip functionality
         const flipper = div.querySelector('.flipper');
         const flipButtons = div.querySelectorAll('.flip-button');
         flipButtons.forEach(button => {
             button.addEventListener('click', () => {
                 flipper.classList.toggle('flipped');
+                showAnnotation();
             });
         });
         return div;
@@ -141,7 +158,7 @@ class Book {
         const [readYear, readMonth, readDay] = this['Date Read'] ? this['Date Read'].split('-') : ['', '', ''];
         div.innerHTML = `
             <img src="${imgSrc}" alt="${this.Title}" class="book-cover w-16 h-24 mr-2" 
-                 onerror="console.error('Failed to load cover for ${this.Title}: ${imgSrc}'); this.src='https://placehold.co/100x150?text=Нет+обложки'; this.onerror=null;">
+                 onerror="handleCoverError(this, 'https://placehold.co/100x150?text=Нет+обложки')">
             <div class="flex-1">
                 <h3 class="text-lg font-semibold text-gray-800 inline">${this.Title}</h3>
                 <p class="text-gray-600 text-sm">Автор: ${author}</p>
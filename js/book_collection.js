@@ -1,6 +1,7 @@
 class BookCollection {
-    constructor(books, customDates) {
+    constructor(books, customDates, stats) {
         this.customDates = customDates || { books: {} };
+        this.stats = stats || {}; // Precomputed indexes from reading_stats.json (by_genre, by_month, ...)
         this.models = books ? books.map(book => new Book(book, this.customDates)) : [];
         this.allBooks = [...this.models];
         this.currentPage = 0; // Track the current page
@@ -11,6 +12,11 @@ class BookCollection {
         }
     }
 
+    // Resolve book_list positions from a precomputed index into Book models
+    booksAt(indexes) {
+        return (indexes || []).map(index => new Book(this.stats.book_list[index], this.customDates));
+    }
+
     filterByGenre(genre) {
         this.models = genre ?
             this.allBooks.filter(book => book.Genres && book.Genres.includes(genre)) :
@@ -93,7 +99,9 @@ class BookCollection {
         const authorPhotos = await response.json();
         const normalizedAuthor = authorName.trim().toLowerCase();
         console.log(`Looking for photo for author: ${authorName}, normalized: ${normalizedAuthor}`);
-        const photoUrl = authorPhotos[normalizedAuthor] || authorPhotos[authorName] || `https://via.placeholder.com/64?text=${encodeURIComponent(authorName)}`;
+        const remoteUrl = authorPhotos[normalizedAuthor] || authorPhotos[authorName];
+        // Prefer the local thumbnail mirrored next to reading_stats.json
+        const photoUrl = (this.stats.author_photo_paths || {})[remoteUrl] || remoteUrl || `https://via.placeholder.com/64?text=${encodeURIComponent(authorName)}`;
         // console.log(`Selected photo URL: ${photoUrl}`);
         return photoUrl;
     }
@@ -163,25 +171,17 @@ class BookCollection {
             console.warn('No books available to render series');
             return;
         }
-        const readBooks = this.allBooks.filter(book => book['Exclusive Shelf'] === 'read');
-        if (readBooks.length === 0) {
+        if (!this.stats.shelves?.read?.books) {
             container.innerHTML = '<p class="text-gray-600">Нет прочитанных книг в сериях</p>';
             console.warn('No read books available to render series');
             return;
         }
+        // Read books grouped by series come precomputed in stats.by_series
         const seriesBooks = {};
-        for (const book of readBooks) {
-            // console.log(`Processing book: ${book.Title}, Series: ${book.Series}`);
-            if (book.Series && book.Series.trim()) {
-                const author = await book.getDisplayAuthor();
-                if (!seriesBooks[book.Series]) {
-                    seriesBooks[book.Series] = { books: [], author };
-                }
-                seriesBooks[book.Series].books.push(book);
-                // console.log(`Added book to series ${book.Series}: ${book.Title} by ${author}`);
-            } else {
-                // console.log(`Skipping book ${book.Title} due to empty or invalid Series: ${book.Series}`);
-            }
+        for (const [series, entry] of Object.entries(this.stats.by_series || {})) {
+            if (!series.trim()) continue;
+            const books = this.booksAt(entry.book_indexes);
+            seriesBooks[series] = { books, author: await books[0].getDisplayAuthor() };
         }
 
         if (Object.keys(seriesBooks).length === 0) {
@@ -210,12 +210,11 @@ class BookCollection {
                 bookDiv.className = 'series-book';
                 bookDiv.style.left = `${index * 60}px`;
                 bookDiv.style.zIndex = (books.length - index).toString();
-                const imgSrc = book.getCoverUrl();
                 bookDiv.innerHTML = `
                     <a href="${book.getGoodreadsBookLink()}" target="_blank">
                         <img src="${book.getCoverUrl()}" alt="${book.Title}" 
                              
-                             onerror="console.error('Failed to load cover for ${book.Title}: ${imgSrc}'); this.src='https://placehold.co/80x120?text=Нет+обложки'; this.onerror=null;">
+                             onerror="handleCoverError(this, 'https://placehold.co/80x120?text=Нет+обложки')">
                     </a>
                 `;
                 rowDiv.appendChild(bookDiv);
@@ -319,10 +318,7 @@ class BookCollection {
             const img = document.createElement('img');
             img.src = book.getCoverUrl();
             img.className = 'w-10 h-[60px] object-cover rounded-md mr-3';
-            img.onerror = () => {
-                img.src = 'https://placehold.co/100x150?text=Нет+обложки';
-                img.onerror = null;
-            };
+            img.onerror = () => handleCoverError(img, 'https://placehold.co/100x150?text=Нет+обложки');
     
             const bookInfo = document.createElement('div');
             bookInfo.className = 'flex-1';
@@ -353,11 +349,10 @@ class BookCollection {
     }
 
     async renderRatingChart() {
+        const byRating = this.stats.by_rating || {};
         const ratingCounts = { 1: 0, 2: 0, 3: 0, 4: 0, 5: 0 };
-        for (const book of this.allBooks) {
-            if (book['Exclusive Shelf'] === 'read' && book['My Rating'] > 0) {
-                ratingCounts[book['My Rating']] = (ratingCounts[book['My Rating']] || 0) + 1;
-            }
+        for (const rating of Object.keys(ratingCounts)) {
+            ratingCounts[rating] = byRating[rating]?.books || 0;
         }
     
         const seriesData = Object.values(ratingCounts);
@@ -376,9 +371,7 @@ class BookCollection {
                 events: {
                     dataPointSelection: async (event, chartContext, config) => {
                         const rating = parseInt(Object.keys(ratingCounts)[config.dataPointIndex], 10);
-                        const filteredBooks = this.allBooks.filter(
-                            book => book['Exclusive Shelf'] === 'read' && book['My Rating'] === rating
-                        );
+                        const filteredBooks = this.booksAt(byRating[rating]?.book_indexes);
     
                         this.createChartPopup(
                             'rating-popup',
@@ -446,17 +439,9 @@ class BookCollection {
     }
 
     async renderTimelineChart() {
-        const timelineData = {};
-        for (const book of this.allBooks) {
-            if (book['Exclusive Shelf'] === 'read' && book['Date Read']) {
-                const [year, month] = book['Date Read'].split('-');
-                const key = `${year}-${month}`;
-                timelineData[key] = (timelineData[key] || 0) + 1;
-            }
-        }
-    
-        const sortedKeys = Object.keys(timelineData).sort();
-        const seriesData = sortedKeys.map(key => timelineData[key]);
+        const byMonth = this.stats.by_month || {};
+        const sortedKeys = Object.keys(byMonth).sort();
+        const seriesData = sortedKeys.map(key => byMonth[key].books);
         const labels = sortedKeys.map(key => {
             const [year, month] = key.split('-');
             return `${month}.${year}`;
@@ -472,11 +457,7 @@ class BookCollection {
                 events: {
                     dataPointSelection: async (event, chartContext, config) => {
                         const selectedMonth = sortedKeys[config.dataPointIndex]; // e.g., "2025-03"
-                        const filteredBooks = this.allBooks.filter(book => {
-                            if (book['Exclusive Shelf'] !== 'read' || !book['Date Read']) return false;
-                            const [year, month] = book['Date Read'].split('-');
-                            return `${year}-${month}` === selectedMonth;
-                        });
+                        const filteredBooks = this.booksAt(byMonth[selectedMonth].book_indexes);
     
                         const [year, month] = selectedMonth.split('-');
                         this.createChartPopup(
@@ -547,17 +528,9 @@ class BookCollection {
     }
 
     async renderGenreChart() {
-        const genreCounts = {};
-        for (const book of this.allBooks) {
-            if (book['Exclusive Shelf'] === 'read') {
-                const genres = book.Genres || [];
-                genres.forEach(genre => {
-                    genreCounts[genre] = (genreCounts[genre] || 0) + 1;
-                });
-            }
-        }
-    
-        const sortedGenres = Object.entries(genreCounts)
+        const byGenre = this.stats.by_genre || {};
+        const sortedGenres = Object.entries(byGenre)
+            .map(([genre, entry]) => [genre, entry.books])
             .filter(([_, count]) => count > 0)
             .sort((a, b) => b[1] - a[1])
             .slice(0, 5);
@@ -575,7 +548,7 @@ class BookCollection {
                 events: {
                     dataPointSelection: async (event, chartContext, config) => {
                         const genre = labels[config.dataPointIndex];
-                        const filteredBooks = this.allBooks.filter(book => book.Genres && book.Genres.includes(genre));
+                        const filteredBooks = this.booksAt(byGenre[genre].book_indexes);
     
                         this.createChartPopup(
                             'genre-popup',
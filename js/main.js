@@ -18,6 +18,10 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         console.log('Fetched data:', data.book_list.length);
 
+        // Annotations and details live in separate shards; remember each book's position to look them up
+        statsShards = data.shards || {};
+        data.book_list.forEach((book, index) => { book.index = index; });
+
         // Update total-books, total-pages, books-2025 inside the "Всего" block
         const totalBookDiv = document.getElementById('total-book')?.closest('div.w-full');
         if (!totalBookDiv) {
@@ -32,11 +36,12 @@ document.addEventListener('DOMContentLoaded', async () => {
         const totalBooksElement = totalContainer.querySelector('p:nth-child(1)');
         const totalPagesElement = totalContainer.querySelector('p:nth-child(2)');
         const books2025Element = totalContainer.querySelector('p:nth-child(3) span');
+        const booksInYear = year => (data.by_year || {})[String(year)]?.books || 0;
 
         if (totalBooksElement && totalPagesElement && books2025Element) {
             totalBooksElement.textContent = getBookDeclension(data.total_books);
             totalPagesElement.textContent = `${data.total_pages.toLocaleString('ru-RU')} страниц`;
-            books2025Element.textContent = data.books_2025;
+            books2025Element.textContent = booksInYear(new Date().getFullYear());
         } else {
             console.error('One or more elements in "Всего" block not found:', {
                 totalBooksElement,
@@ -51,17 +56,20 @@ document.addEventListener('DOMContentLoaded', async () => {
             return;
         }
 
-        // Pass customDates to BookCollection
-        const allBooks = new BookCollection(data.book_list, customDates);
-        const books = new BookCollection(data.book_list.filter(book => book['Exclusive Shelf'] === 'read'), customDates);
-        const currentBooks = new BookCollection(data.book_list.filter(book => book['Exclusive Shelf'] === 'currently-reading'), customDates);
-        const toReadBooks = new BookCollection(data.book_list.filter(book => book['Exclusive Shelf'] === 'to-read'), customDates);
+        // Pass customDates and the precomputed indexes to BookCollection
+        // Stats files without the shelf index (written before it existed) are split by scanning book_list
+        const shelfBooks = shelf => data.shelves
+            ? (data.shelves[shelf]?.book_indexes || []).map(index => data.book_list[index])
+            : data.book_list.filter(book => book['Exclusive Shelf'] === shelf);
+        const allBooks = new BookCollection(data.book_list, customDates, data);
+        const books = new BookCollection(shelfBooks('read'), customDates, data);
+        const currentBooks = new BookCollection(shelfBooks('currently-reading'), customDates, data);
+        const toReadBooks = new BookCollection(shelfBooks('to-read'), customDates, data);
 
         // Populate the genre filter dropdown
         const genreFilter = document.getElementById('genre-filter');
-        const uniqueGenres = [...new Set(books.allBooks
-            .flatMap(book => book.Genres || [])
-            .filter(genre => genre && genre.trim()))]
+        const uniqueGenres = Object.keys(data.by_genre || {})
+            .filter(genre => genre && genre.trim())
             .sort();
         uniqueGenres.forEach(genre => {
             const option = document.createElement('option');
@@ -134,11 +142,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
 
         // Calculate statistics for the "Статистика чтения" block
-        const uniqueSeries = [...new Set(books.allBooks
-            .filter(book => book.Series && book.Series.trim())
-            .map(book => book.Series))]
-            .sort();
-        const totalSeries = uniqueSeries.length;
+        const totalSeries = Object.keys(data.by_series || {}).filter(series => series.trim()).length;
 
         let averageBooksPerMonth = 0;
         if (books.allBooks.length > 0) {
@@ -198,7 +202,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
 
         const challengeGoal = 50;
-        const booksRead2025 = data.books_2025;
+        const booksRead2025 = booksInYear(2025);
         const startDate = new Date('2025-01-01');
         const endDate = new Date('2025-12-31');
         const today = new Date('2025-02-26');
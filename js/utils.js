@@ -6,4 +6,33 @@ function getBookDeclension(count) {
     } else {
         return `${count} книг`;
     }
-}
\ No newline at end of file
+}
+
+// Shard paths from reading_stats.json ("shards"), set once the summary is loaded
+let statsShards = {};
+const shardRequests = {};
+
+// Fetch a stats shard once; later calls share the same promise
+function loadShard(name) {
+    const path = statsShards[name];
+    if (!path) return Promise.resolve(null);
+    if (!shardRequests[path]) {
+        shardRequests[path] = fetch(path).then(response => {
+            if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
+            return response.json();
+        });
+    }
+    return shardRequests[path];
+}
+
+
+// Mirrored covers are WebP with a JPEG twin: try the JPEG first, then the placeholder
+function handleCoverError(img, placeholder) {
+    if (img.src.endsWith('.webp')) {
+        img.src = img.src.replace(/\.webp$/, '.jpg');
+    } else {
+        console.error(`Failed to load cover: ${img.src}`);
+        img.onerror = null;
+        img.src = placeholder;
+    }
+}
@@ -1,55 +1,134 @@
-import pandas as pd
+import argparse
+import atexit
+import logging
+import os
 import time
+import pandas as pd
 from utils.data_loader import load_and_preprocess_data, load_mappings
-from utils.api_fetch import fetch_book_data, fetch_goodreads_annotation, fetch_goodreads_genres
+from utils.api_fetch import fetch_book_data, fetch_goodreads_annotation, fetch_goodreads_cover, fetch_goodreads_genres
+from utils.bulk_lookup import open_library_description, prefetch_volumes
+from utils.checkpoint import CHECKPOINT_ROWS, append_checkpoint, checkpoint_path_for, load_checkpoint, remove_checkpoint
 from utils.cover_fetch import get_cover_url
+from utils.cover_mirror import mirror_author_photos, mirror_covers
+from utils.http_client import run_concurrently
+from utils.incremental import ENRICHED_COLUMNS, compute_row_hashes, has_enrichment, load_previous_books, reuse_enrichment
+from utils.instrumentation import count, enable_profiling, stage, write_report
+from utils.normalization import MappingIndex
+from utils.replay import install_replay
 from utils.stats_generator import generate_stats
 
-# Load data and mappings
-df = load_and_preprocess_data()
-correct_ids, series_mapping, genre_translation, excluded_genres, author_mapping, custom_genres = load_mappings()
-
-# Apply annotations from Goodreads as primary source
-df['Annotation'] = df.apply(
-    lambda row: fetch_goodreads_annotation(row['Book Id']) if pd.notna(row['Book Id'])
-    else fetch_book_data(row['ISBN'] or row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], genre_translation, excluded_genres)[1],
-    axis=1
-)
-time.sleep(1)  # Rate limiting after Goodreads fetch
-
-# Fallback to Google Books if Goodreads fails
-df['Annotation'] = df.apply(
-    lambda row: fetch_book_data(row['ISBN'] or row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], genre_translation, excluded_genres)[1]
-    if pd.isna(row['Annotation']) and (row['ISBN'] or row['ISBN13'] or row['Title'])
-    else row['Annotation'],
-    axis=1
-)
-time.sleep(1)  # Rate limiting after Google Books fallback
-
-# Apply genres with Google Books as primary and Goodreads as fallback
-df['Genres'] = df.apply(
-    lambda row: fetch_book_data(row['ISBN'] or row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], genre_translation, excluded_genres)[0]
-    if (row['ISBN'] or row['ISBN13'] or row['Title']) and len(fetch_book_data(row['ISBN'] or row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], genre_translation, excluded_genres)[0]) > 0
-    else fetch_goodreads_genres(row['Book Id'], genre_translation, excluded_genres),
-    axis=1
-)
-time.sleep(1)  # Rate limiting
-
-# Apply custom genres from custom_genres.json
-df['Genres'] = df.apply(
-    lambda row: list(set(row['Genres'] + custom_genres.get(row['Title'], []))),  # Combine existing genres with custom genres and remove duplicates
-    axis=1
-)
-
-# Assign manual series for Sergei Lukyanenko and Suzanne Collins books
-df.loc[df['Author'] == 'Sergei Lukyanenko', 'Series'] = df['Title'].map(series_mapping)
-df.loc[df['Author'] == 'Suzanne Collins', 'Series'] = df['Title'].map(series_mapping)
-
-# Process all books for covers
-df.loc[:, 'Cover URL'] = df.apply(
-    lambda row: get_cover_url(row['ISBN'], row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], correct_ids),
-    axis=1
-)
-
-# Generate stats and save to JSON
-generate_stats(df)
\ No newline at end of file
+def enrich_book(row, correct_ids, mapping_index):
+    """Fetch annotation, genres and cover for one book (runs on a worker thread).
+
+    The three parts are timed as the genres, annotate and covers stages, summed over all worker threads.
+    """
+    has_lookup_keys = bool(row['ISBN'] or row['ISBN13'] or row['Title'])
+
+    with stage('genres'):
+        # One memoized Google Books resolution feeds the genres and the annotation fallback
+        google_genres, google_annotation = [], None
+        if has_lookup_keys:
+            google_genres, google_annotation = fetch_book_data(row['ISBN'], row['Title'], row['Author'], row['Additional Authors'], mapping_index, isbn13=row['ISBN13'])
+
+        # Genres with Google Books as primary and Goodreads as fallback
+        genres = google_genres
+        if not genres and pd.notna(row['Book Id']):
+            genres = fetch_goodreads_genres(row['Book Id'], mapping_index)
+
+    with stage('annotate'):
+        # Annotations from Goodreads as primary source, Google Books and Open Library as fallback
+        annotation = fetch_goodreads_annotation(row['Book Id']) if pd.notna(row['Book Id']) else None
+        if annotation is None:
+            annotation = google_annotation or open_library_description(row['ISBN'], row['ISBN13'])
+
+    with stage('covers'):
+        # Covers from Google Books, falling back to the (already fetched) Goodreads page
+        cover_url = get_cover_url(row['ISBN'], row['ISBN13'], row['Title'], row['Author'], row['Additional Authors'], correct_ids)
+        if not cover_url and pd.notna(row['Book Id']):
+            cover_url = fetch_goodreads_cover(row['Book Id'])
+    return {'Annotation': annotation, 'Genres': genres, 'Cover URL': cover_url}
+
+def process_library(csv_path='goodreads_library_export.csv', data_dir='data', output_path='reading_stats.json', full=False, time_budget=None):
+    """Enrich one Goodreads export with the mappings in data_dir and write its stats to output_path.
+
+    Enriched rows are checkpointed every CHECKPOINT_ROWS rows. If time_budget (minutes) runs out
+    first, the stats are not written and None is returned; the next run resumes from the checkpoint.
+    """
+    deadline = time.monotonic() + time_budget * 60 if time_budget else None
+    checkpoint_path = checkpoint_path_for(output_path)
+    # Load data and mappings
+    with stage('load', local=True):
+        correct_ids, series_mapping, genre_translation, excluded_genres, author_mapping, custom_genres = load_mappings(data_dir)
+        mapping_index = MappingIndex(genre_translation, excluded_genres, custom_genres, series_mapping, author_mapping)
+        df = load_and_preprocess_data(csv_path, mapping_index)
+
+    # Reuse enrichment from the previous stats file and an interrupted run's checkpoint for unchanged rows
+    with stage('incremental', local=True):
+        df['Row Hash'] = compute_row_hashes(df, mapping_index, correct_ids)
+        checkpointed = load_checkpoint(checkpoint_path)
+        previous = {} if full else load_previous_books(output_path)
+        pending = reuse_enrichment(df, {**previous, **checkpointed})
+        todo = df.loc[pending]
+    count('rows_total', len(df))
+    count('rows_enriched', len(todo))
+    count('rows_skipped', len(df) - len(todo))
+
+    if not todo.empty:
+        # Resolve ISBNs in bulk first; enrich_book then only makes per-book requests for misses
+        books = todo.to_dict(orient='records')
+        with stage('prefetch'):
+            prefetch_volumes(books)
+
+        # Books are enriched concurrently (utils.http_client rate-limits each host) in checkpointed batches
+        with stage('enrich'):
+            for start in range(0, len(books), CHECKPOINT_ROWS):
+                if deadline and time.monotonic() > deadline:
+                    logging.warning(f"Time budget used up after {start} of {len(books)} rows; the next run resumes from {checkpoint_path}")
+                    return None
+                batch = books[start:start + CHECKPOINT_ROWS]
+                enriched = run_concurrently(lambda row: enrich_book(row, correct_ids, mapping_index), batch)
+                checkpoint_rows = {}
+                for idx, row, result in zip(todo.index[start:start + CHECKPOINT_ROWS], batch, enriched):
+                    for col in ENRICHED_COLUMNS:
+                        df.at[idx, col] = result[col]
+                    if not has_enrichment(result):
+                        # Annotation or genres missing (block page, 5xx, timeout): no Row Hash, so the next run retries the row
+                        df.at[idx, 'Row Hash'] = None
+                    elif pd.notna(row['Book Id']):
+                        checkpoint_rows[str(row['Book Id'])] = {'Row Hash': row['Row Hash'], **result}
+                append_checkpoint(checkpoint_path, checkpoint_rows)
+    else:
+        logging.info("No new or changed books to enrich")
+
+    # Mirror covers and author photos as local fixed-size WebP/JPEG thumbnails next to the stats output
+    with stage('mirror'):
+        output_dir = os.path.dirname(output_path)
+        df['Cover URL'] = mirror_covers(df['Cover URL'], output_dir)
+        author_photo_paths = mirror_author_photos(os.path.join(data_dir, 'author_photos.json'), output_dir)
+
+    # Apply custom genres from custom_genres.json and merge Latin/Cyrillic spellings of authors
+    with stage('postprocess', local=True):
+        df['Genres'] = mapping_index.merge_custom_genres(df['Title'], df['Genres'])
+        df['Author'] = mapping_index.canonical_authors(df['Author'])
+
+    # Generate stats and save to JSON; the checkpoint is only dropped once they are complete
+    with stage('stats', local=True):
+        generate_stats(df, output_path, author_photo_paths)
+    remove_checkpoint(checkpoint_path)
+    return output_path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate reading_stats.json from the Goodreads library export.')
+    parser.add_argument('--full', action='store_true', help='Re-enrich every book instead of only new or changed rows')
+    parser.add_argument('--profile', action='store_true', help='Profile the local (non-network) stages with cProfile into run_profile.prof')
+    parser.add_argument('--time-budget', type=float, help='Stop enriching after this many minutes and resume on the next run')
+    args = parser.parse_args()
+
+    # Stage timings, HTTP and cache metrics go to run_report.json, also when the run fails
+    if args.profile:
+        enable_profiling()
+    atexit.register(write_report)
+
+    # HTTP_REPLAY_MODE=record captures live responses as fixtures, =replay serves them back offline
+    install_replay()
+    process_library(full=args.full, time_budget=args.time_budget)
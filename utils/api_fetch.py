@@ -1,134 +1,156 @@
+import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import html
 import logging
+import re
+import threading
 import time
 import os
-import urllib.parse
+from utils.cache import cached_lookup, book_id_key
+from utils.http_client import http_get
+from utils.volume_resolver import resolve_volume
 
-def fetch_book_data(isbn, title, author, additional_authors, genre_translation, excluded_genres):
+try:
+    import lxml  # noqa: F401
+    GOODREADS_PARSER = os.environ.get('GOODREADS_PARSER', 'lxml')
+except ImportError:
+    GOODREADS_PARSER = os.environ.get('GOODREADS_PARSER', 'html.parser')
+# Only build the description/genre subtrees of the (large) book page; set to 0 to parse everything
+GOODREADS_PARSE_ONLY = os.environ.get('GOODREADS_PARSE_ONLY', '1') != '0'
+OG_IMAGE_RE = re.compile(r'<meta[^>]+property="og:image"[^>]+content="([^"]+)"')
+SERIES_RE = re.compile(r'aria-label="Book [^"]*? in the ([^"]+) series"')
+_page_memo = {}  # Book Id key -> (record, exception) of this run's page fetch
+_page_memo_lock = threading.Lock()
+GOODREADS_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+def fetch_book_data(isbn, title, author, additional_authors, mapping_index, isbn13=None):
     """Fetch genres and annotation from Google Books API."""
-    genres = []
-    annotation = None
-    if isbn and isinstance(isbn, str) and len(isbn.replace('-', '')) in [10, 13]:
-        api_key = os.environ.get('GOOGLE_BOOKS_API_KEY', 'YOUR_GOOGLE_BOOKS_API_KEY')
-        url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn.replace('-', '')}&key={api_key}"
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('items') and data['items'][0].get('volumeInfo'):
-                    volume_info = data['items'][0]['volumeInfo']
-                    genres = volume_info.get('categories', [])[:3]
-                    translated_genres = [genre_translation.get(genre, genre) for genre in genres if genre not in excluded_genres]
-                    genres = translated_genres if translated_genres else []
-                    annotation = volume_info.get('description', None)
-                    logging.info(f"Fetched genres from Google Books for ISBN {isbn}: {genres}")
-                else:
-                    logging.warning(f"No data found for ISBN {isbn} from Google Books, trying title/author")
-                    title_encoded = urllib.parse.quote(title)
-                    author_clean = urllib.parse.quote(author.strip())
-                    url = f"https://www.googleapis.com/books/v1/volumes?q={title_encoded}+inauthor:{author_clean}"
-                    try:
-                        response = requests.get(url, timeout=10)
-                        if response.status_code == 200:
-                            data = response.json()
-                            if data.get('totalItems', 0) > 0:
-                                volume_info = data['items'][0]['volumeInfo']
-                                genres = volume_info.get('categories', [])[:3]
-                                translated_genres = [genre_translation.get(genre, genre) for genre in genres if genre not in excluded_genres]
-                                genres = translated_genres if translated_genres else []
-                                annotation = volume_info.get('description', None)
-                                logging.info(f"Fetched genres from Google Books for {title} by {author}: {genres}")
-                    except requests.RequestException as e:
-                        logging.error(f"Error fetching data for {title} by {author}: {e}")
-            else:
-                logging.error(f"Google Books API error for ISBN {isbn}: {response.status_code} - {response.text}")
-        except requests.RequestException as e:
-            logging.error(f"Error fetching data from Google Books for ISBN {isbn}: {e}")
-    elif title and author:
-        title_encoded = urllib.parse.quote(title)
-        author_clean = urllib.parse.quote(author.strip())
-        url = f"https://www.googleapis.com/books/v1/volumes?q={title_encoded}+inauthor:{author_clean}"
+    volume_info = resolve_volume(isbn, isbn13, title, author, additional_authors)
+    if not volume_info:
+        logging.warning(f"No data found for {title} by {author} from Google Books")
+        return [], None
+    genres = mapping_index.clean_genres(volume_info.get('categories', []))
+    logging.info(f"Fetched genres from Google Books for {title} by {author}: {genres}")
+    return genres, volume_info.get('description', None)
+
+def parse_goodreads_book_page(html_text, parser=GOODREADS_PARSER, parse_only=GOODREADS_PARSE_ONLY):
+    """Extract description, raw genre tags, cover image and series name from a Goodreads book page."""
+    strainer = SoupStrainer(attrs={'data-testid': ['description', 'genresList']}) if parse_only else None
+    soup = BeautifulSoup(html_text, parser, parse_only=strainer)
+    description_div = soup.find('div', {'data-testid': 'description'})
+    genres_div = soup.find('div', {'data-testid': 'genresList'})
+    if parse_only and not genres_div:
+        # Older page layout without the data-testid genre list (BookPageTagButton tags): fall back to a full parse
+        soup = BeautifulSoup(html_text, parser)
+        description_div = soup.find('div', {'data-testid': 'description'})
+        genres_div = soup.find('div', {'data-testid': 'genresList'})
+
+    description = None
+    if description_div:
+        description = ' '.join(description_div.get_text(separator=' ', strip=True).split()) or None
+    if genres_div:
+        genre_buttons = genres_div.find_all('a', class_='Button--tag')
+        genres = [button.find('span', class_='Button__labelItem').text for button in genre_buttons if button.find('span', class_='Button__labelItem')]
+    else:
+        genres = [tag.text.strip() for tag in soup.find_all('a', class_='BookPageTagButton') if tag.text.strip()]
+
+    cover_match = OG_IMAGE_RE.search(html_text)
+    series_match = SERIES_RE.search(html_text)
+    return {
+        'description': description,
+        'genres': genres,
+        'cover_url': html.unescape(cover_match.group(1)) if cover_match else None,
+        'series': html.unescape(series_match.group(1)) if series_match else None
+    }
+
+def clear_page_memo():
+    """Forget all per-run Goodreads page outcomes."""
+    with _page_memo_lock:
+        _page_memo.clear()
+
+def fetch_goodreads_book_page(book_id):
+    """Fetch and parse a Goodreads book page once, returning the record from parse_goodreads_book_page.
+
+    The page is requested at most once per run, also when that request fails; the record is cached on disk per Book Id
+    and shared by annotation, genre and cover lookups.
+    Raises requests.RequestException on network or HTTP errors and on pages without description or genres (block pages).
+    """
+    key = book_id_key(book_id)
+    with _page_memo_lock:
+        outcome = _page_memo.get(key)
+    if outcome is None:
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('totalItems', 0) > 0:
-                    volume_info = data['items'][0]['volumeInfo']
-                    genres = volume_info.get('categories', [])[:3]
-                    translated_genres = [genre_translation.get(genre, genre) for genre in genres if genre not in excluded_genres]
-                    genres = translated_genres if translated_genres else []
-                    annotation = volume_info.get('description', None)
-                    logging.info(f"Fetched genres from Google Books for {title} by {author}: {genres}")
-        except requests.RequestException as e:
-            logging.error(f"Error fetching data for {title} by {author}: {e}")
-    return genres, annotation
+            outcome = (_fetch_goodreads_book_page(book_id, key), None)
+        except Exception as e:
+            outcome = (None, e)
+        with _page_memo_lock:
+            _page_memo[key] = outcome
+    record, error = outcome
+    if error is not None:
+        raise error
+    return record
+
+def _fetch_goodreads_book_page(book_id, key):
+    def fetch():
+        response = http_get(f"https://www.goodreads.com/book/show/{book_id}", headers=GOODREADS_HEADERS, timeout=10)
+        response.raise_for_status()
+        record = parse_goodreads_book_page(response.text)
+        if not record['description'] and not record['genres']:
+            # Most likely a block or captcha page served with 200: raise so it is not cached
+            raise requests.RequestException(f"Goodreads page for Book ID {book_id} has no description or genres")
+        return record
+    return cached_lookup('goodreads_page', [key], fetch) or {'description': None, 'genres': [], 'cover_url': None, 'series': None}
 
 def fetch_goodreads_annotation(book_id):
     """Fetch annotation from Goodreads book page."""
-    if not book_id or book_id == '':
+    if pd.isna(book_id) or book_id == '':
         logging.warning(f"Invalid or empty Book ID: {book_id}, returning fallback")
         return None
-    url = f"https://www.goodreads.com/book/show/{book_id}"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            description_div = soup.find('div', {'data-testid': 'description'})
-            if description_div:
-                annotation = ' '.join(description_div.get_text(separator=' ', strip=True).split())
-                if annotation and len(annotation.strip()) > 0:
-                    logging.info(f"Fetched annotation from Goodreads for Book ID {book_id}: {annotation[:50]}...")
-                    return annotation
-                logging.warning(f"No valid annotation found for Book ID {book_id}")
-            else:
-                logging.warning(f"No description div found for Book ID {book_id}")
-        else:
-            logging.error(f"Goodreads API error for Book ID {book_id}: {response.status_code} - {response.text}")
+        annotation = fetch_goodreads_book_page(book_id)['description']
+        if annotation:
+            logging.info(f"Fetched annotation from Goodreads for Book ID {book_id}: {annotation[:50]}...")
+            return annotation
+        logging.warning(f"No valid annotation found for Book ID {book_id}")
     except requests.RequestException as e:
         logging.error(f"Error fetching annotation for Book ID {book_id}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error fetching annotation for Book ID {book_id}: {e}")
     return None
 
-def fetch_goodreads_genres(book_id, genre_translation, excluded_genres):
+def fetch_goodreads_genres(book_id, mapping_index):
     """Fetch genres from Goodreads book page as a fallback."""
-    if not book_id or book_id == '':
+    if pd.isna(book_id) or book_id == '':
         logging.warning(f"Invalid or empty Book ID: {book_id}, returning fallback")
         return []
-    url = f"https://www.goodreads.com/book/show/{book_id}"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            genres_div = soup.find('div', {'data-testid': 'genresList'})
-            if genres_div:
-                genre_buttons = genres_div.find_all('a', class_='Button--tag')
-                genres = [button.find('span', class_='Button__labelItem').text for button in genre_buttons if button.find('span', class_='Button__labelItem')]
-                filtered_genres = [g for g in genres if g not in excluded_genres]
-                translated_genres = [genre_translation.get(genre, genre) for genre in filtered_genres[:3]]
-                if translated_genres:
-                    logging.info(f"Fetched genres from Goodreads for Book ID {book_id}: {translated_genres}")
-                    return translated_genres
-                logging.warning(f"No valid genres found for Book ID {book_id}")
-            else:
-                logging.warning(f"No genres div found for Book ID {book_id}, trying alternative parsing")
-                alternative_genres = soup.find_all('a', class_='BookPageTagButton')
-                if alternative_genres:
-                    genres = [tag.text.strip() for tag in alternative_genres if tag.text.strip()]
-                    filtered_genres = [g for g in genres if g not in excluded_genres]
-                    translated_genres = [genre_translation.get(genre, genre) for genre in filtered_genres[:3]]
-                    if translated_genres:
-                        logging.info(f"Fetched alternative genres from Goodreads for Book ID {book_id}: {translated_genres}")
-                        return translated_genres
-                logging.warning(f"No alternative genres found for Book ID {book_id}")
-        else:
-            logging.error(f"Goodreads API error for Book ID {book_id}: {response.status_code} - {response.text}")
+        # The page record keeps raw tags so translation/exclusion changes apply without refetching
+        translated_genres = mapping_index.clean_genres(fetch_goodreads_book_page(book_id)['genres'])
+        if translated_genres:
+            logging.info(f"Fetched genres from Goodreads for Book ID {book_id}: {translated_genres}")
+            return translated_genres
+        logging.warning(f"No valid genres found for Book ID {book_id}")
     except requests.RequestException as e:
         logging.error(f"Error fetching genres for Book ID {book_id}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error fetching genres for Book ID {book_id}: {e}")
     logging.info(f"Fallback to empty genres list for Book ID {book_id}")
-    return []
\ No newline at end of file
+    return []
+
+def fetch_goodreads_cover(book_id):
+    """Fetch cover image URL from Goodreads book page as a fallback."""
+    if pd.isna(book_id) or book_id == '':
+        return None
+    try:
+        cover = fetch_goodreads_book_page(book_id)['cover_url']
+        if cover:
+            logging.info(f"Fetched cover from Goodreads for Book ID {book_id}: {cover}")
+        return cover
+    except requests.RequestException as e:
+        logging.error(f"Error fetching cover for Book ID {book_id}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error fetching cover for Book ID {book_id}: {e}")
+    return None
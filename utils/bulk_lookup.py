@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import re
+import uuid
+import requests
+from utils.cache import MISS, get_cached, set_cached, isbn_key
+from utils.http_client import http_get, http_post
+from utils.volume_resolver import volume_from_search
+
+GOOGLE_BATCH_URL = 'https://www.googleapis.com/batch/books/v1'
+GOOGLE_BATCH_SIZE = 40
+OPEN_LIBRARY_URL = 'https://openlibrary.org/api/books'
+OPEN_LIBRARY_BATCH_SIZE = 50
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _uncached(namespace, keys):
+    return [key for key in dict.fromkeys(keys) if key and get_cached(namespace, key) is MISS]
+
+def _parse_batch_response(response):
+    """Split a multipart/mixed batch response into {Content-ID index: (status, JSON body)}."""
+    boundary = re.search(r'boundary="?([^";]+)"?', response.headers.get('Content-Type', ''))
+    if not boundary:
+        raise ValueError('Batch response has no multipart boundary')
+    results = {}
+    for part in response.text.split(f"--{boundary.group(1)}"):
+        content_id = re.search(r'Content-ID:\s*<response-item(\d+)>', part, re.IGNORECASE)
+        status = re.search(r'HTTP/[\d.]+ (\d{3})', part)
+        if not content_id or not status:
+            continue
+        # The embedded HTTP response body follows the first blank line after its status line
+        body = re.split(r'\r?\n\r?\n', part[status.start():], maxsplit=1)
+        payload = body[1].strip() if len(body) > 1 else ''
+        results[int(content_id.group(1))] = (int(status.group(1)), json.loads(payload) if payload else {})
+    return results
+
+def prefetch_google_volumes(isbn_keys):
+    """Resolve ISBN keys through the Google Books batch endpoint, seeding the 'google_books' cache.
+
+    Keys that fail inside a batch (or whole failed batches) are left uncached so that
+    resolve_volume() looks them up one by one as before.
+    """
+    pending = _uncached('google_books', isbn_keys)
+    if not pending:
+        return
+    api_key = os.environ.get('GOOGLE_BOOKS_API_KEY')
+    resolved = 0
+    for batch in _chunks(pending, GOOGLE_BATCH_SIZE):
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for i, key in enumerate(batch):
+            path = f"/books/v1/volumes?q={key}" + (f"&key={api_key}" if api_key else '')
+            parts.append(f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <item{i}>\r\n\r\nGET {path}\r\n\r\n")
+        body = ''.join(parts) + f"--{boundary}--\r\n"
+        try:
+            response = http_post(GOOGLE_BATCH_URL, data=body.encode('utf-8'), headers={'Content-Type': f'multipart/mixed; boundary={boundary}'})
+            response.raise_for_status()
+            results = _parse_batch_response(response)
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"Google Books batch of {len(batch)} failed, falling back to single lookups: {e}")
+            continue
+        for i, key in enumerate(batch):
+            status, data = results.get(i, (None, None))
+            if status == 200:
+                set_cached('google_books', key, volume_from_search(data))
+                resolved += 1
+    logging.info(f"Google Books batch lookup resolved {resolved} of {len(pending)} uncached ISBNs")
+
+def _open_library_record(record):
+    details = record.get('details', {})
+    description = details.get('description')
+    if isinstance(description, dict):
+        description = description.get('value')
+    cover = None
+    if details.get('covers'):
+        cover = f"https://covers.openlibrary.org/b/id/{details['covers'][0]}-M.jpg"
+    elif record.get('thumbnail_url'):
+        cover = record['thumbnail_url'].replace('-S.jpg', '-M.jpg')
+    if not description and not cover:
+        return None
+    return {'categories': [], 'description': description, 'imageLinks': {'thumbnail': cover} if cover else {}}
+
+def prefetch_open_library(isbn_keys):
+    """Resolve ISBN keys with Open Library's multi-bibkey endpoint, seeding the 'open_library' cache."""
+    pending = _uncached('open_library', isbn_keys)
+    if not pending:
+        return
+    found = 0
+    for batch in _chunks(pending, OPEN_LIBRARY_BATCH_SIZE):
+        bibkeys = ','.join(f"ISBN:{key.split(':', 1)[1]}" for key in batch)
+        try:
+            response = http_get(f"{OPEN_LIBRARY_URL}?bibkeys={bibkeys}&format=json&jscmd=details", timeout=30)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"Open Library batch of {len(batch)} failed: {e}")
+            continue
+        for key in batch:
+            record = data.get(f"ISBN:{key.split(':', 1)[1]}")
+            volume = _open_library_record(record) if record else None
+            set_cached('open_library', key, volume)
+            found += volume is not None
+    logging.info(f"Open Library bulk lookup found {found} of {len(pending)} uncached ISBNs")
+
+def prefetch_volumes(books):
+    """Bulk-resolve the ISBNs of the given book records before per-book enrichment."""
+    pairs = [(isbn_key(book.get('ISBN13')), isbn_key(book.get('ISBN'))) for book in books]
+    prefetch_google_volumes([isbn13 for isbn13, _ in pairs if isbn13])
+    # ISBN-10 only where the ISBN-13 found nothing, matching resolve_volume's order
+    prefetch_google_volumes([isbn for isbn13, isbn in pairs if isbn and (not isbn13 or get_cached('google_books', isbn13) is None)])
+    prefetch_open_library([key for pair in pairs for key in pair if key])
+
+def open_library_description(isbn, isbn13):
+    """Description from a prefetched Open Library record, without making any request."""
+    for key in [isbn_key(isbn13), isbn_key(isbn)]:
+        volume = get_cached('open_library', key) if key else MISS
+        if volume is not MISS and volume and volume.get('description'):
+            return volume['description']
+    return None
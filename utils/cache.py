@@ -0,0 +1,210 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from utils.instrumentation import record_cache
+
+CACHE_PATH = os.environ.get('ENRICHMENT_CACHE_PATH', 'data/enrichment_cache.sqlite')
+DEFAULT_TTL = int(os.environ.get('ENRICHMENT_CACHE_TTL', 30 * 24 * 3600))  # 30 days
+NEGATIVE_TTL = int(os.environ.get('ENRICHMENT_CACHE_NEGATIVE_TTL', 3 * 24 * 3600))  # 3 days for "not found" results
+
+MISS = object()  # Sentinel for "not in cache", distinct from a cached negative (None) result
+CLAIM_TIMEOUT = 120  # seconds to wait for another process's fetch of the same key before fetching anyway
+
+_lock = threading.Lock()
+_connection = None
+_claims = None  # (Manager dict, Manager lock) when fetches are coordinated between processes
+
+def _connect():
+    """Open (once) the SQLite cache database and make sure the schema exists."""
+    global _connection
+    if _connection is None:
+        directory = os.path.dirname(CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _connection = sqlite3.connect(CACHE_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+        _connection.execute('PRAGMA journal_mode=WAL')
+        _connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, '
+            'created_at REAL NOT NULL, expires_at REAL NOT NULL, '
+            'PRIMARY KEY (namespace, key))'
+        )
+        atexit.register(close_cache)
+    return _connection
+
+def configure_cache(path):
+    """Point the cache at another database file, closing the current connection."""
+    global CACHE_PATH
+    close_cache()
+    CACHE_PATH = path
+
+def close_cache():
+    """Fold the WAL back into the main database file and close the connection."""
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            _connection.close()
+            _connection = None
+
+def normalize_text(value):
+    """Normalize free text for use in cache keys (Unicode NFKC, case-folded, single spaces)."""
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', value).casefold().split())
+
+def book_id_key(book_id):
+    """Cache key for a Goodreads Book Id."""
+    if book_id is None or book_id == '' or (isinstance(book_id, float) and book_id != book_id):
+        return None
+    return f"book:{int(book_id) if isinstance(book_id, float) else book_id}"
+
+def isbn_key(isbn):
+    """Cache key for an ISBN-10 or ISBN-13, or None if the value is not a valid ISBN."""
+    if not isbn or not isinstance(isbn, str):
+        return None
+    digits = re.sub(r'[^0-9Xx]', '', isbn).upper()
+    return f"isbn:{digits}" if len(digits) in [10, 13] else None
+
+def title_author_key(title, author):
+    """Cache key for a normalized title + author pair."""
+    title_norm, author_norm = normalize_text(title), normalize_text(author)
+    if not title_norm or not author_norm:
+        return None
+    return f"title_author:{title_norm}|{author_norm}"
+
+def title_key(title):
+    """Cache key for a normalized title alone (broad searches)."""
+    title_norm = normalize_text(title)
+    return f"title:{title_norm}" if title_norm else None
+
+def get_cached(namespace, key):
+    """Return the cached value for (namespace, key), or MISS if absent or expired."""
+    with _lock:
+        row = _connect().execute(
+            'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?', (namespace, key)
+        ).fetchone()
+    if row is None or row[1] < time.time():
+        return MISS
+    return json.loads(row[0])
+
+def set_cached(namespace, key, value, ttl=None):
+    """Store a value; None is cached as a negative result with the shorter NEGATIVE_TTL."""
+    if ttl is None:
+        ttl = NEGATIVE_TTL if value is None else DEFAULT_TTL
+    now = time.time()
+    with _lock:
+        _connect().execute(
+            'INSERT OR REPLACE INTO cache (namespace, key, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, json.dumps(value, ensure_ascii=False), now, now + ttl)
+        )
+
+def share_fetch_claims(claims, lock):
+    """Coordinate cached_lookup with other processes (Manager dict and lock) so each key is fetched by one of them."""
+    global _claims
+    _claims = (claims, lock)
+
+def _first_cached(namespace, keys):
+    for key in keys:
+        value = get_cached(namespace, key)
+        if value is not MISS:
+            logging.debug(f"Cache hit for {namespace}/{key}")
+            return value
+    return MISS
+
+def _claim_or_wait(namespace, keys):
+    """Claim keys for fetching, or wait for the process holding them to cache a value and return it."""
+    claims, lock = _claims
+    names = [f"{namespace}/{key}" for key in keys]
+    owner = f"{os.getpid()}:{threading.get_ident()}"
+    deadline = time.time() + CLAIM_TIMEOUT
+    while True:
+        with lock:
+            if not any(name in claims for name in names) or time.time() > deadline:
+                claims.update({name: owner for name in names})
+                return MISS
+        time.sleep(0.2)
+        value = _first_cached(namespace, keys)
+        if value is not MISS:
+            return value
+
+def _release(namespace, keys):
+    claims, lock = _claims
+    with lock:
+        for key in keys:
+            claims.pop(f"{namespace}/{key}", None)
+
+def cached_lookup(namespace, keys, fetch, ttl=None):
+    """Return the first cached value among keys, or call fetch() and store its result under every key.
+
+    fetch() should raise (e.g. requests.RequestException) on transient failures so that
+    errors are never cached; a None return value is cached as a negative result.
+    """
+    keys = [key for key in keys if key]
+    value = _first_cached(namespace, keys)
+    if value is MISS and _claims is not None and keys:
+        value = _claim_or_wait(namespace, keys)
+        if value is MISS:
+            try:
+                # The previous owner may have stored its value just before our claim
+                value = _first_cached(namespace, keys)
+                if value is MISS:
+                    return _fetch_and_store(namespace, keys, fetch, ttl)
+            finally:
+                _release(namespace, keys)
+    if value is not MISS:
+        record_cache(namespace, True)
+        return value
+    return _fetch_and_store(namespace, keys, fetch, ttl)
+
+def _fetch_and_store(namespace, keys, fetch, ttl):
+    record_cache(namespace, False)
+    value = fetch()
+    for key in keys:
+        set_cached(namespace, key, value, ttl)
+    return value
+
+def invalidate(namespace=None, key=None):
+    """Delete cache entries, optionally restricted to a namespace and/or a single key."""
+    query, params = 'DELETE FROM cache', []
+    conditions = []
+    if namespace:
+        conditions.append('namespace = ?')
+        params.append(namespace)
+    if key:
+        conditions.append('key = ?')
+        params.append(key)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    with _lock:
+        deleted = _connect().execute(query, params).rowcount
+    logging.info(f"Invalidated {deleted} cache entries (namespace={namespace}, key={key})")
+    return deleted
+
+def purge_expired():
+    """Delete all expired entries."""
+    with _lock:
+        deleted = _connect().execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),)).rowcount
+    logging.info(f"Purged {deleted} expired cache entries")
+    return deleted
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='Manage the enrichment cache.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    clear_parser = subparsers.add_parser('clear', help='Invalidate cache entries')
+    clear_parser.add_argument('--namespace', help='Only entries from this namespace (e.g. google_books)')
+    clear_parser.add_argument('--key', help='Only this key (e.g. isbn:9785171829889 or book:12449778)')
+    subparsers.add_parser('purge', help='Delete expired entries')
+    args = parser.parse_args()
+    if args.command == 'clear':
+        invalidate(args.namespace, args.key)
+    else:
+        purge_expired()
@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+import tempfile
+
+CHECKPOINT_ROWS = int(os.environ.get('CHECKPOINT_ROWS', 100))  # enriched rows between checkpoint writes
+_UMASK = os.umask(0)  # read once (os.umask can only be read by setting it) and restored right away
+os.umask(_UMASK)
+
+def atomic_write(path, data):
+    """Write bytes to path via a temporary file in the same directory and os.replace, so readers never see partial files.
+
+    The file gets the mode open() would give it (0666 minus the umask), not mkstemp's 0600.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def atomic_write_json(path, payload, **kwargs):
+    """json.dump payload to path atomically; kwargs are passed to json.dumps."""
+    atomic_write(path, json.dumps(payload, ensure_ascii=False, **kwargs).encode('utf-8'))
+
+def checkpoint_path_for(output_path):
+    """Checkpoint location for a stats output: <output stem>.checkpoint.jsonl next to it."""
+    return f"{os.path.splitext(output_path)[0]}.checkpoint.jsonl"
+
+def load_checkpoint(path):
+    """Return {Book Id: enriched row} saved by an unfinished run, or {} if there is none.
+
+    Later lines win over earlier ones for the same Book Id; a line cut off by a killed run is skipped.
+    The file is compacted to one line per book when it holds more than that.
+    """
+    if not os.path.exists(path):
+        return {}
+    rows, lines = {}, 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                lines += 1
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping incomplete line {lines} of checkpoint {path}")
+                    continue
+                rows[row.pop('Book Id')] = row
+    except OSError as e:
+        logging.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return {}
+    if lines > len(rows):
+        data = ''.join(json.dumps({'Book Id': book_id, **row}, ensure_ascii=False) + '\n' for book_id, row in rows.items())
+        atomic_write(path, data.encode('utf-8'))
+    logging.info(f"Resuming from checkpoint {path} with {len(rows)} enriched rows")
+    return rows
+
+def append_checkpoint(path, rows):
+    """Append {Book Id: enriched row} for one batch to the checkpoint, one JSON line per book, and fsync it.
+
+    Only the new batch is written, so checkpointing stays linear in the library size.
+    """
+    with open(path, 'a', encoding='utf-8') as f:
+        for book_id, row in rows.items():
+            f.write(json.dumps({'Book Id': book_id, **row}, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def remove_checkpoint(path):
+    """Delete the checkpoint once its rows are part of a completed stats file."""
+    if os.path.exists(path):
+        os.remove(path)
+        logging.info(f"Removed checkpoint {path}")
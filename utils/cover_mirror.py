@@ -0,0 +1,105 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import requests
+from utils.checkpoint import atomic_write_json
+from utils.http_client import http_get, run_concurrently
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it covers keep their remote URLs
+    Image = None
+
+COVER_DIR = 'assets/covers'  # relative to the directory of the stats output, like the paths written into it
+THUMBNAIL_SIZE = (200, 300)  # 2x the largest rendered cover (100x150, object-fit: cover)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+_manifest_lock = threading.Lock()  # replaced by a Manager lock when batch workers share a cover directory
+
+def share_manifest_lock(lock):
+    """Serialize manifest updates with other processes (Manager lock) mirroring into the same directory."""
+    global _manifest_lock
+    _manifest_lock = lock
+
+def _manifest_path(base_dir):
+    return os.path.join(base_dir, COVER_DIR, 'manifest.json')
+
+def _load_manifest(base_dir):
+    if not os.path.exists(_manifest_path(base_dir)):
+        return {}
+    with open(_manifest_path(base_dir), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _is_remote(url):
+    return isinstance(url, str) and url.startswith(('http://', 'https://'))
+
+def _thumbnail_paths(content_hash):
+    return f"{COVER_DIR}/{content_hash}.webp", f"{COVER_DIR}/{content_hash}.jpg"
+
+def _mirror_one(url, manifest, base_dir):
+    """Download one image and write WebP + JPEG thumbnails named by content hash; returns a manifest entry."""
+    entry = manifest.get(url)
+    if entry and all(os.path.exists(os.path.join(base_dir, path)) for path in _thumbnail_paths(entry['hash'])):
+        return entry
+    source_url = url.replace('http://books.google.com', 'https://books.google.com')
+    try:
+        response = http_get(source_url, timeout=20)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.error(f"Error downloading cover {url}: {e}")
+        return None
+    content_hash = hashlib.sha1(response.content).hexdigest()[:16]
+    webp_path, jpeg_path = (os.path.join(base_dir, path) for path in _thumbnail_paths(content_hash))
+    if not (os.path.exists(webp_path) and os.path.exists(jpeg_path)):
+        try:
+            image = ImageOps.fit(Image.open(io.BytesIO(response.content)).convert('RGB'), THUMBNAIL_SIZE, Image.LANCZOS)
+        except OSError as e:
+            logging.error(f"Could not decode cover {url}: {e}")
+            return None
+        image.save(webp_path, 'WEBP', quality=WEBP_QUALITY, method=6)
+        image.save(jpeg_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        logging.info(f"Mirrored cover {url} -> {webp_path}")
+    return {'hash': content_hash}
+
+def mirror_images(urls, base_dir=''):
+    """Mirror remote image URLs into COVER_DIR under base_dir; returns {remote url: local WebP path} for the ones that succeeded.
+
+    Returned paths are relative to base_dir. Images already listed in the manifest with both thumbnails on disk
+    are not downloaded again, and identical images reached through different URLs share one pair of files.
+    """
+    if Image is None:
+        logging.warning("Pillow is not installed, skipping cover mirroring")
+        return {}
+    os.makedirs(os.path.join(base_dir, COVER_DIR), exist_ok=True)
+    manifest = _load_manifest(base_dir)
+    remote_urls = list(dict.fromkeys(url for url in urls if _is_remote(url)))
+    entries = run_concurrently(lambda url: _mirror_one(url, manifest, base_dir), remote_urls)
+    # Merge into the manifest as it is now, under the lock: other batch workers may mirror into the same directory
+    with _manifest_lock:
+        manifest = _load_manifest(base_dir)
+        for url, entry in zip(remote_urls, entries):
+            if entry:
+                manifest[url] = entry
+        atomic_write_json(_manifest_path(base_dir), manifest, indent=2, sort_keys=True)
+    return {url: _thumbnail_paths(entry['hash'])[0] for url, entry in zip(remote_urls, entries) if entry}
+
+def mirror_covers(cover_urls, base_dir=''):
+    """Return the Cover URL column with remote covers replaced by local WebP thumbnails (paths relative to base_dir)."""
+    local_paths = mirror_images(cover_urls, base_dir)
+    logging.info(f"Mirrored {len(local_paths)} covers into {os.path.join(base_dir, COVER_DIR)}")
+    return cover_urls.map(lambda url: local_paths.get(url, url) if _is_remote(url) else url)
+
+def mirror_author_photos(photos_path='data/author_photos.json', base_dir=''):
+    """Mirror the remote photos listed in author_photos.json; returns {remote url: local WebP path relative to base_dir}.
+
+    The hand-maintained author_photos.json is only read, so it keeps its remote URLs for every output.
+    """
+    with open(photos_path, 'r', encoding='utf-8') as f:
+        author_photos = json.load(f)
+    local_paths = mirror_images(author_photos.values(), base_dir)
+    logging.info(f"Mirrored {len(local_paths)} author photos into {os.path.join(base_dir, COVER_DIR)}")
+    return local_paths
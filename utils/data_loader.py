@@ -1,53 +1,63 @@
 import pandas as pd
 import json
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
-def load_mappings():
-    """Load all mappings from JSON files."""
-    with open('data/correct_ids.json', 'r', encoding='utf-8') as f:
+CSV_CHUNKSIZE = int(os.environ.get('CSV_CHUNKSIZE', 50_000))
+DATE_FORMAT = '%Y/%m/%d'
+# The export columns the pipeline uses; the rest (reviews, notes, publisher...) are never converted.
+# Pages and ratings are read as float32 (blank cells are NaN) and narrowed after fillna(0).
+CSV_DTYPES = {
+    'Book Id': 'Int64',
+    'Title': str,
+    'Author': str,
+    'Additional Authors': str,
+    'ISBN': str,
+    'ISBN13': str,
+    'My Rating': 'float32',
+    'Number of Pages': 'float32',
+    'Date Read': str,
+    'Date Added': str,
+    'Bookshelves': str,
+    'Bookshelves with positions': str,
+    'Exclusive Shelf': str,
+}
+# Low-cardinality text columns stored as categoricals
+CATEGORY_COLUMNS = ['Author', 'Exclusive Shelf', 'Bookshelves']
+
+def load_mappings(data_dir='data'):
+    """Load all mappings from the JSON files in data_dir."""
+    with open(os.path.join(data_dir, 'correct_ids.json'), 'r', encoding='utf-8') as f:
         correct_ids = json.load(f)
-    with open('data/series_mapping.json', 'r', encoding='utf-8') as f:
+    with open(os.path.join(data_dir, 'series_mapping.json'), 'r', encoding='utf-8') as f:
         series_mapping = json.load(f)
-    with open('data/genre_translation.json', 'r', encoding='utf-8') as f:
+    with open(os.path.join(data_dir, 'genre_translation.json'), 'r', encoding='utf-8') as f:
         genre_translation = json.load(f)
-    with open('data/excluded_genres.json', 'r', encoding='utf-8') as f:
+    with open(os.path.join(data_dir, 'excluded_genres.json'), 'r', encoding='utf-8') as f:
         excluded_genres = set(json.load(f))
-    with open('data/author_mapping.json', 'r', encoding='utf-8') as f:
+    with open(os.path.join(data_dir, 'author_mapping.json'), 'r', encoding='utf-8') as f:
         author_mapping = json.load(f)
-    with open('data/custom_genres.json', 'r', encoding='utf-8') as f:
+    with open(os.path.join(data_dir, 'custom_genres.json'), 'r', encoding='utf-8') as f:
         custom_genres = json.load(f)
     return correct_ids, series_mapping, genre_translation, excluded_genres, author_mapping, custom_genres
 
-def load_and_preprocess_data():
-    """Load and preprocess the Goodreads CSV data."""
-    try:
-        df = pd.read_csv('goodreads_library_export.csv', encoding='utf-8')
-        logging.info(f"CSV loaded with {len(df)} rows")
-        logging.info(f"Sample Author data: {df['Author'].head().to_string()}")
-    except Exception as e:
-        logging.error(f"Failed to load CSV: {e}")
-        raise
-
-    # Load mappings
-    _, series_mapping, _, _, _, _ = load_mappings()  # Updated to unpack all six values
-
-    # Preprocess data
-    df['Number of Pages'] = pd.to_numeric(df['Number of Pages'], errors='coerce').fillna(0).astype(int)
+def preprocess_chunk(df, mapping_index=None):
+    """Derive and clean columns of one chunk of the export."""
+    df['Number of Pages'] = df['Number of Pages'].fillna(0).astype('int32')
     df['Estimated Word Count'] = df['Number of Pages'] * 275
-    df['Date Read'] = pd.to_datetime(df['Date Read'], errors='coerce')
-    df['Date Added'] = pd.to_datetime(df['Date Added'], errors='coerce')
-    df['My Rating'] = df['My Rating'].fillna(0).astype(int)
+    df['Date Read'] = pd.to_datetime(df['Date Read'], format=DATE_FORMAT, errors='coerce')
+    df['Date Added'] = pd.to_datetime(df['Date Added'], format=DATE_FORMAT, errors='coerce')
+    df['My Rating'] = df['My Rating'].fillna(0).astype('int8')
 
-    # Enhanced Series extraction before title cleanup
-    df['Series'] = df['Title'].str.extract(r'\(([^,]+),\s*#?\d+\)', expand=False)
-    df.loc[df['Author'] == 'Sergei Lukyanenko', 'Series'] = df['Title'].map(series_mapping)
-    df.loc[df['Author'] == 'Suzanne Collins', 'Series'] = df['Title'].map(series_mapping)
-    logging.info(f"Processed Series data sample before cleanup: {df[['Title', 'Author', 'Series']].head().to_string()}")
+    # Enhanced Series extraction before title cleanup; the regexes only run on titles with parentheses
+    has_parens = df['Title'].str.contains('(', regex=False, na=False)
+    df['Series'] = df.loc[has_parens, 'Title'].str.extract(r'\(([^,]+),\s*#?\d+\)', expand=False).reindex(df.index)
 
     # Clean up titles and other fields
-    df['Title'] = df['Title'].str.replace(r'\s*\([^)]+\)', '', regex=True).str.strip()
+    df.loc[has_parens, 'Title'] = df.loc[has_parens, 'Title'].str.replace(r'\s*\([^)]+\)', '', regex=True)
+    df['Title'] = df['Title'].str.strip()
     df['Bookshelves'] = df['Bookshelves'].fillna('')
     df['Bookshelves with positions'] = df['Bookshelves with positions'].fillna('')
     df['Exclusive Shelf'] = df['Exclusive Shelf'].fillna('')
@@ -55,4 +65,27 @@ def load_and_preprocess_data():
     df['ISBN13'] = df['ISBN13'].str.strip('="')
     df['Additional Authors'] = df['Additional Authors'].fillna('')
 
-    return df
\ No newline at end of file
+    # Manual series from series_mapping.json take precedence over the series parsed from the title
+    if mapping_index is not None:
+        df['Series'] = mapping_index.apply_series(df['Title'], df['Series'])
+    return df
+
+def iter_export_chunks(csv_path='goodreads_library_export.csv', mapping_index=None, chunksize=CSV_CHUNKSIZE):
+    """Yield preprocessed chunks of the export, parsing only the columns the pipeline uses."""
+    reader = pd.read_csv(csv_path, encoding='utf-8', usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield preprocess_chunk(chunk, mapping_index)
+
+def load_and_preprocess_data(csv_path='goodreads_library_export.csv', mapping_index=None, chunksize=CSV_CHUNKSIZE):
+    """Load and preprocess the Goodreads CSV data in chunks, applying series overrides from a MappingIndex."""
+    try:
+        df = pd.concat(iter_export_chunks(csv_path, mapping_index, chunksize), ignore_index=True)
+    except Exception as e:
+        logging.error(f"Failed to load CSV: {e}")
+        raise
+    # Categories are assigned after concatenation so that all chunks share one set of codes
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    logging.info(f"CSV loaded with {len(df)} rows ({df.memory_usage(deep=True).sum() / 1024:.0f} KiB)")
+    return df
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from utils.instrumentation import record_request
+
+MAX_WORKERS = int(os.environ.get('HTTP_MAX_WORKERS', 8))
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Requests per second and burst size per host; unknown hosts use DEFAULT_RATE
+HOST_RATES = {
+    'www.googleapis.com': (5.0, 5),
+    'www.goodreads.com': (1.0, 2),
+    'books.google.com': (5.0, 5),
+}
+DEFAULT_RATE = (2.0, 2)
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SharedTokenBucket:
+    """Token bucket whose state lives in a multiprocessing.Manager dict, so worker processes share one limit per host."""
+
+    def __init__(self, host, rate, burst, state, lock):
+        self.host = host
+        self.rate = rate
+        self.capacity = burst
+        self.state = state
+        self.lock = lock
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()  # wall clock: comparable across processes
+                tokens, updated = self.state.get(self.host, (float(self.capacity), now))
+                tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self.state[self.host] = (tokens - 1, now)
+                    return
+                self.state[self.host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_shared_limits = None  # (Manager dict, Manager lock) when rate limits are shared between processes
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS))
+_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS))
+_transport = _session.request
+
+def set_transport(transport=None):
+    """Replace the callable that sends requests (signature of Session.request); None restores the session.
+
+    utils.replay uses this to record or replay traffic without touching the fetchers.
+    """
+    global _transport
+    _transport = transport or _session.request
+
+def configure_rate_limits(host_rates=None, default_rate=None):
+    """Override per-host (rate, burst) limits, e.g. for offline benchmarks, and reset all buckets."""
+    global DEFAULT_RATE
+    with _buckets_lock:
+        if host_rates is not None:
+            HOST_RATES.clear()
+            HOST_RATES.update(host_rates)
+        if default_rate is not None:
+            DEFAULT_RATE = default_rate
+        _buckets.clear()
+
+def share_rate_limits(state, lock):
+    """Enforce the per-host limits jointly with other processes through a Manager dict and lock."""
+    global _shared_limits
+    with _buckets_lock:
+        _shared_limits = (state, lock)
+        _buckets.clear()
+
+def _bucket_for(host):
+    with _buckets_lock:
+        if host not in _buckets:
+            rate, burst = HOST_RATES.get(host, DEFAULT_RATE)
+            _buckets[host] = SharedTokenBucket(host, rate, burst, *_shared_limits) if _shared_limits else TokenBucket(rate, burst)
+        return _buckets[host]
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return 2 ** attempt
+
+def http_request(method, url, headers=None, timeout=10, **kwargs):
+    """Send a request through the shared session, honouring per-host rate limits and retrying 429/5xx with backoff.
+
+    Returns the last response (which may still be an error status); raises requests.RequestException
+    if the final attempt fails at the transport level.
+    """
+    host = urllib.parse.urlsplit(url).hostname
+    bucket = _bucket_for(host)
+    for attempt in range(MAX_RETRIES + 1):
+        start = time.perf_counter()
+        bucket.acquire()
+        throttled, start = time.perf_counter() - start, time.perf_counter()
+        try:
+            response = _transport(method, url, headers=headers, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            record_request(host, type(e).__name__, time.perf_counter() - start, throttled, retry=attempt > 0)
+            if attempt == MAX_RETRIES or not isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                raise
+            delay = _retry_delay(None, attempt)
+            logging.warning(f"Request to {url} failed ({e}), retrying in {delay:.0f}s")
+        else:
+            record_request(host, response.status_code, time.perf_counter() - start, throttled, retry=attempt > 0)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            delay = _retry_delay(response, attempt)
+            logging.warning(f"Got {response.status_code} from {url}, retrying in {delay:.0f}s")
+        time.sleep(delay)
+
+def http_get(url, headers=None, timeout=10):
+    """GET a URL via http_request."""
+    return http_request('GET', url, headers=headers, timeout=timeout)
+
+def http_post(url, data=None, headers=None, timeout=30):
+    """POST a body via http_request."""
+    return http_request('POST', url, headers=headers, timeout=timeout, data=data)
+
+def run_concurrently(func, items, max_workers=MAX_WORKERS):
+    """Apply func to every item on a bounded thread pool, returning results in input order."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
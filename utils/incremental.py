@@ -0,0 +1,73 @@
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+from utils.cache import normalize_text
+from utils.stats_generator import load_stats
+
+ENRICHED_COLUMNS = ['Annotation', 'Genres', 'Cover URL']
+# Columns (plus per-title overrides) whose change means a row has to be enriched again
+HASH_COLUMNS = ['Book Id', 'Title', 'Author', 'Additional Authors', 'ISBN', 'ISBN13']
+
+def mappings_digest(mapping_index):
+    """Digest of the (normalized) genre translation and exclusion mappings that shape every row's Genres."""
+    payload = json.dumps([mapping_index.translations, sorted(mapping_index.excluded)], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def compute_row_hashes(df, mapping_index, correct_ids):
+    """Hash the enrichment inputs of every row, including its custom genre and cover overrides.
+
+    Custom genres are looked up by normalized title like MappingIndex applies them (correct_ids by exact title,
+    like get_cover_url). Edits to genre_translation or excluded_genres change every hash, so reused rows never
+    keep stale genres; re-enriching them is served from the raw-response cache.
+    """
+    digest = mappings_digest(mapping_index)
+    hashes = []
+    for values in zip(*(df[col] for col in HASH_COLUMNS)):
+        title = values[1]
+        payload = [None if pd.isna(v) else str(v) for v in values]
+        payload += [mapping_index.custom_genres.get(normalize_text(title)), correct_ids.get(title), digest]
+        hashes.append(hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()[:16])
+    return pd.Series(hashes, index=df.index, dtype=object)
+
+def load_previous_books(stats_path='reading_stats.json'):
+    """Return {Book Id: book} from a previously generated stats file, or {} if there is none."""
+    if not os.path.exists(stats_path):
+        logging.info(f"No previous {stats_path} found, enriching all rows")
+        return {}
+    try:
+        book_list = load_stats(stats_path).get('book_list', [])
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read previous {stats_path}, enriching all rows: {e}")
+        return {}
+    return {book['Book Id']: book for book in book_list if book.get('Book Id')}
+
+def has_enrichment(book):
+    """Whether enrichment found both an annotation and genres; other rows are retried on the next run.
+
+    One of them alone usually means a source was failing (e.g. only an Open Library description during a
+    Goodreads outage); books that really lack one are retried, mostly answered from the cache.
+    A cover does not count, since correct_ids covers are resolved without the failing hosts.
+    """
+    return bool(book.get('Annotation') and book.get('Genres'))
+
+def reuse_enrichment(df, previous_books):
+    """Copy enriched columns from previous output into unchanged rows that were enriched successfully.
+
+    Returns a boolean Series marking the rows that are new or changed and still need enrichment.
+    """
+    for col in ENRICHED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+        df[col] = df[col].astype(object)
+
+    pending = pd.Series(True, index=df.index)
+    for idx, book_id, row_hash in zip(df.index, df['Book Id'], df['Row Hash']):
+        previous = previous_books.get(None if pd.isna(book_id) else str(book_id))
+        if previous and previous.get('Row Hash') == row_hash and has_enrichment(previous):
+            for col in ENRICHED_COLUMNS:
+                df.at[idx, col] = previous.get(col)
+            pending.at[idx] = False
+    logging.info(f"Incremental mode: {int(pending.sum())} new or changed rows, {int((~pending).sum())} reused")
+    return pending
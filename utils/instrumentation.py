@@ -0,0 +1,128 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_started = time.time()
+_stages = {}
+_requests = defaultdict(lambda: {'latencies': [], 'statuses': Counter(), 'retries': 0, 'throttled': 0.0})
+_cache = defaultdict(Counter)
+_counters = Counter()
+_profiler = None
+
+def _percentile(values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+def reset():
+    """Forget everything recorded so far, e.g. between libraries processed in one worker."""
+    global _started
+    with _lock:
+        _started = time.time()
+        _stages.clear()
+        _requests.clear()
+        _cache.clear()
+        _counters.clear()
+
+def enable_profiling():
+    """Collect a cProfile profile of the stages marked local=True."""
+    global _profiler
+    _profiler = cProfile.Profile()
+
+@contextmanager
+def stage(name, local=False):
+    """Time a pipeline stage; local (non-network) stages are also profiled when profiling is enabled."""
+    profile = _profiler is not None and local
+    if profile:
+        _profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if profile:
+            _profiler.disable()
+        with _lock:
+            _stages[name] = _stages.get(name, 0) + elapsed
+
+def record_request(host, status, elapsed, throttled=0.0, retry=False):
+    """Record one HTTP attempt; status is the HTTP status code or the exception class name.
+
+    throttled is the time spent waiting for the host's rate limiter before sending.
+    """
+    with _lock:
+        entry = _requests[host]
+        entry['latencies'].append(elapsed)
+        entry['throttled'] += throttled
+        entry['statuses'][str(status)] += 1
+        entry['retries'] += retry
+
+def record_cache(namespace, hit):
+    """Count a cache lookup that was answered from the cache (hit) or had to be fetched."""
+    with _lock:
+        _cache[namespace]['hits' if hit else 'misses'] += 1
+
+def count(name, value=1):
+    """Add to a free-form counter such as rows_enriched."""
+    with _lock:
+        _counters[name] += value
+
+def build_report():
+    """Return the run report as a JSON-serializable dict."""
+    with _lock:
+        hosts = {}
+        for host, entry in sorted(_requests.items()):
+            latencies = sorted(entry['latencies'])
+            hosts[host] = {
+                'requests': len(latencies),
+                'retries': entry['retries'],
+                'statuses': dict(entry['statuses']),
+                'latency_ms': {f"p{q}": round(_percentile(latencies, q) * 1000, 1) for q in (50, 90, 99)},
+                'total_seconds': round(sum(latencies), 3),
+                'throttled_seconds': round(entry['throttled'], 3),
+            }
+        cache = {}
+        for namespace, counts in sorted(_cache.items()):
+            lookups = counts['hits'] + counts['misses']
+            cache[namespace] = {'hits': counts['hits'], 'misses': counts['misses'], 'hit_rate': round(counts['hits'] / lookups, 3)}
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_started)),
+            'wall_seconds': round(time.time() - _started, 3),
+            'stages': {name: round(seconds, 3) for name, seconds in _stages.items()},
+            'http': hosts,
+            'cache': cache,
+            'counters': dict(_counters),
+        }
+
+def write_report(path='run_report.json', profile_path='run_profile.prof'):
+    """Write the run report (and the profile, if enabled), log a short summary and return the report."""
+    report = build_report()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Run report written to '{path}' ({report['wall_seconds']:.1f}s total)")
+    for name, seconds in report['stages'].items():
+        logging.info(f"  stage {name}: {seconds:.2f}s")
+    for host, entry in report['http'].items():
+        logging.info(
+            f"  {host}: {entry['requests']} requests, {entry['retries']} retries, {entry['throttled_seconds']:.1f}s throttled, "
+            f"p50 {entry['latency_ms']['p50']}ms, p99 {entry['latency_ms']['p99']}ms, statuses {entry['statuses']}"
+        )
+    for namespace, entry in report['cache'].items():
+        logging.info(f"  cache {namespace}: {entry['hit_rate']:.0%} hits ({entry['hits']}/{entry['hits'] + entry['misses']})")
+    for name, value in report['counters'].items():
+        logging.info(f"  {name}: {value}")
+
+    if _profiler is not None:
+        _profiler.dump_stats(profile_path)
+        summary = io.StringIO()
+        pstats.Stats(_profiler, stream=summary).sort_stats('cumulative').print_stats(20)
+        logging.info(f"Profile of local stages written to '{profile_path}':\n{summary.getvalue()}")
+    return report
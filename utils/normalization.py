@@ -0,0 +1,55 @@
+import pandas as pd
+from utils.cache import normalize_text
+
+def normalize_column(values):
+    """normalize_text for a whole Series (NFKC, case-folded, single spaces); categoricals are normalized per category."""
+    return values.str.normalize('NFKC').str.casefold().str.split().str.join(' ')
+
+class MappingIndex:
+    """Genre, series, custom genre and author lookups compiled once from the data/*.json mappings.
+
+    All keys are compared after normalize_text, so case, Unicode form and extra spaces in either
+    the mappings or the export do not matter.
+    """
+
+    def __init__(self, genre_translation, excluded_genres, custom_genres, series_mapping, author_mapping):
+        self.excluded = {normalize_text(genre) for genre in excluded_genres}
+        self.translations = {normalize_text(genre): translated for genre, translated in genre_translation.items()}
+        self.custom_genres = {normalize_text(title): list(genres) for title, genres in custom_genres.items()}
+        self.series = {normalize_text(title): series for title, series in series_mapping.items()}
+        # The Latin spelling and the mapped (Cyrillic) display name of an author both resolve to the display name
+        self.authors = {}
+        for name, display_name in author_mapping.items():
+            self.authors[normalize_text(name)] = display_name
+            self.authors[normalize_text(display_name)] = display_name
+
+    def clean_genres(self, genres, limit=3):
+        """Drop excluded genres and translate the rest, keeping the first `limit` distinct ones in order."""
+        cleaned = []
+        for genre in genres:
+            key = normalize_text(genre)
+            translated = self.translations.get(key, genre)
+            if key in self.excluded or normalize_text(translated) in self.excluded or translated in cleaned:
+                continue
+            cleaned.append(translated)
+            if len(cleaned) == limit:
+                break
+        return cleaned
+
+    def apply_series(self, titles, series):
+        """Series column with series_mapping overrides by (cleaned) title, for books by any author."""
+        overrides = normalize_column(titles).map(self.series)
+        return overrides.where(overrides.notna(), series)
+
+    def canonical_authors(self, authors):
+        """Author column with every known alias replaced by the author's display name."""
+        canonical = normalize_column(authors).map(self.authors)
+        canonical = canonical.where(canonical.notna(), authors.astype(object))
+        return canonical.astype('category') if isinstance(authors.dtype, pd.CategoricalDtype) else canonical
+
+    def merge_custom_genres(self, titles, genres):
+        """Genre lists with custom genres by title appended (without duplicates); missing lists become []."""
+        merged = pd.Series([value if isinstance(value, list) else [] for value in genres], index=genres.index, dtype=object)
+        for idx, extra in normalize_column(titles).map(self.custom_genres).dropna().items():
+            merged.at[idx] = list(dict.fromkeys(merged.at[idx] + extra))
+        return merged
@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import requests
+from requests.structures import CaseInsensitiveDict
+from utils import http_client
+
+REPLAY_MODE = os.environ.get('HTTP_REPLAY_MODE', 'off')  # off, record or replay
+FIXTURES_DIR = os.environ.get('HTTP_FIXTURES_DIR', 'fixtures/http')
+REPLAY_LATENCY = float(os.environ.get('HTTP_REPLAY_LATENCY', 0))  # seconds added to every replayed response
+REPLAY_ERROR_RATE = float(os.environ.get('HTTP_REPLAY_ERROR_RATE', 0))  # share of replayed requests answered with 503
+SECRET_PARAMS = {'key'}  # query parameters never written to fixtures or used in fixture keys
+SECRET_PARAM_RE = re.compile(r'([?&])(?:' + '|'.join(SECRET_PARAMS) + r')=[^&\s]*(&?)')
+
+class FixtureMissing(requests.RequestException):
+    """No fixture was recorded for a replayed request (not retried by http_request)."""
+
+def _sanitize_url(url):
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe=':,+')))
+
+def _normalize_body(data, headers):
+    """Request body with API keys and random multipart boundaries replaced, so fixture keys are stable."""
+    if data is None:
+        return b''
+    body = data.decode('utf-8', 'replace') if isinstance(data, bytes) else str(data)
+    boundary = re.search(r'boundary="?([^";]+)"?', (headers or {}).get('Content-Type', ''))
+    if boundary:
+        body = body.replace(boundary.group(1), 'BOUNDARY')
+    # Request lines embedded in batch bodies are not parsed, so drop secret parameters textually
+    body = SECRET_PARAM_RE.sub(lambda m: m.group(1) if m.group(2) else '', body)
+    return body.encode('utf-8')
+
+def fixture_key(method, url, data=None, headers=None):
+    """Stable fixture name for a request: sha1 of method, sanitized URL and normalized body."""
+    digest = hashlib.sha1(f"{method.upper()} {_sanitize_url(url)}\n".encode('utf-8'))
+    digest.update(_normalize_body(data, headers))
+    return digest.hexdigest()
+
+def build_response(url, status=200, body=b'', content_type='text/html; charset=utf-8', headers=None):
+    """Construct a requests.Response without a network round trip."""
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = body if isinstance(body, bytes) else body.encode('utf-8')
+    response.headers = CaseInsensitiveDict({'Content-Type': content_type, **(headers or {})})
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+    return response
+
+def _fixture_path(fixtures_dir, key):
+    return os.path.join(fixtures_dir, key[:2], f"{key}.json")
+
+def save_fixture(fixtures_dir, method, url, response, data=None, headers=None):
+    """Write one response as a JSON fixture; text bodies are stored verbatim, binary ones as base64."""
+    path = _fixture_path(fixtures_dir, fixture_key(method, url, data, headers))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fixture = {
+        'method': method.upper(),
+        'url': _sanitize_url(url),
+        'status': response.status_code,
+        'content_type': response.headers.get('Content-Type', ''),
+    }
+    try:
+        fixture['body'] = response.content.decode('utf-8')
+    except UnicodeDecodeError:
+        fixture['body_base64'] = base64.b64encode(response.content).decode('ascii')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False)
+
+def load_fixture(fixtures_dir, method, url, data=None, headers=None):
+    """Return the recorded response for a request, or None if there is no fixture."""
+    path = _fixture_path(fixtures_dir, fixture_key(method, url, data, headers))
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        fixture = json.load(f)
+    body = base64.b64decode(fixture['body_base64']) if 'body_base64' in fixture else fixture['body'].encode('utf-8')
+    return build_response(url, fixture['status'], body, fixture['content_type'])
+
+class ReplayTransport:
+    """http_client transport that records live responses to fixtures or serves them back.
+
+    In replay mode every response is delayed by `latency` seconds and a share `error_rate` of
+    requests is answered with 503 (Retry-After: 0) to exercise the retry path. Requests without
+    a fixture go to `fallback(method, url, **kwargs)` if given, otherwise raise FixtureMissing.
+    """
+
+    def __init__(self, mode='replay', fixtures_dir=FIXTURES_DIR, latency=0.0, error_rate=0.0, fallback=None, seed=0):
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fallback = fallback
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'recorded': 0, 'replayed': 0, 'fallback': 0, 'missing': 0, 'injected_errors': 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def __call__(self, method, url, headers=None, timeout=None, **kwargs):
+        data = kwargs.get('data')
+        if self.mode == 'record':
+            response = http_client._session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            save_fixture(self.fixtures_dir, method, url, response, data, headers)
+            self._count('recorded')
+            return response
+
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            inject_error = self.error_rate and self.random.random() < self.error_rate
+        if inject_error:
+            self._count('injected_errors')
+            return build_response(url, 503, b'Injected error', 'text/plain', {'Retry-After': '0'})
+        response = load_fixture(self.fixtures_dir, method, url, data, headers) if self.fixtures_dir else None
+        if response is not None:
+            self._count('replayed')
+            return response
+        if self.fallback is not None:
+            self._count('fallback')
+            return self.fallback(method, url, headers=headers, **kwargs)
+        self._count('missing')
+        raise FixtureMissing(f"No fixture for {method} {_sanitize_url(url)} in {self.fixtures_dir}")
+
+def install_replay(mode=REPLAY_MODE, fixtures_dir=FIXTURES_DIR, latency=REPLAY_LATENCY, error_rate=REPLAY_ERROR_RATE, fallback=None):
+    """Route http_client through a ReplayTransport (or back to the live session for mode 'off'); returns the transport."""
+    if mode == 'off':
+        http_client.set_transport(None)
+        return None
+    if mode not in ('record', 'replay'):
+        raise ValueError(f"Unknown HTTP replay mode: {mode}")
+    transport = ReplayTransport(mode, fixtures_dir, latency, error_rate, fallback)
+    http_client.set_transport(transport)
+    logging.info(f"HTTP {mode} mode using fixtures in {fixtures_dir}")
+    return transport
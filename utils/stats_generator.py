@@ -1,22 +1,55 @@
 import pandas as pd
+import hashlib
 import json
 import logging
+import os
+from utils.checkpoint import atomic_write, atomic_write_json
 
-def generate_stats(df):
-    """Generate reading statistics and save to JSON."""
+# Fields the dashboard needs to render book cards; everything else goes into lazily loaded shards
+CARD_FIELDS = [
+    'Title', 'Author', 'Additional Authors', 'Number of Pages', 'Date Read', 'Date Added', 'My Rating',
+    'Series', 'Exclusive Shelf', 'Cover URL', 'Genres', 'Book Id'
+]
+SHARD_DIR = 'stats'
+UNSHELVED = 'unshelved'  # details shard name for books without an Exclusive Shelf
+
+def _grouped_index(keys, pages, sort=True):
+    """Group book_list positions by key into {key: {'books', 'pages', 'book_indexes'}}; null keys are skipped."""
+    frame = pd.DataFrame({'key': keys.to_numpy(), 'pages': pages.to_numpy(), 'position': keys.index.to_numpy()}).dropna(subset=['key'])
+    frame = frame[frame['key'] != '']
+    grouped = frame.groupby('key', sort=sort).agg(
+        books=('position', 'size'),
+        pages=('pages', 'sum'),
+        book_indexes=('position', lambda positions: positions.tolist())
+    )
+    return {str(key): {'books': int(row.books), 'pages': int(row.pages), 'book_indexes': row.book_indexes} for key, row in grouped.iterrows()}
+
+def build_aggregates(df):
+    """Precompute per-shelf, genre, series, year, month and rating indexes over book_list positions."""
+    books = df.reset_index(drop=True)
+    read = books[books['Exclusive Shelf'] == 'read']
+    rated = read[read['My Rating'] > 0]
+    read_genres = read['Genres'].explode()
+    return {
+        'shelves': _grouped_index(books['Exclusive Shelf'], books['Number of Pages']),
+        'by_genre': _grouped_index(read_genres, read.loc[read_genres.index, 'Number of Pages'], sort=False),
+        'by_series': _grouped_index(read['Series'], read['Number of Pages'], sort=False),
+        'by_year': _grouped_index(read['Date Read'].dt.strftime('%Y'), read['Number of Pages']),
+        'by_month': _grouped_index(read['Date Read'].dt.strftime('%Y-%m'), read['Number of Pages']),
+        'by_rating': _grouped_index(rated['My Rating'].astype(str), rated['Number of Pages'])
+    }
+
+def build_stats(df):
+    """Build the reading statistics dictionary from the enriched DataFrame (no I/O)."""
     # Filter read books for stats
-    books_read = df[df['Exclusive Shelf'] == 'read'].copy()
+    books_read = df[df['Exclusive Shelf'] == 'read']
     logging.info(f"Filtered {len(books_read)} read books")
 
-    # Calculate Days Spent only for read books
-    books_read.loc[:, 'Days Spent'] = (books_read['Date Read'] - books_read['Date Added']).dt.days
-
     total_books = len(books_read)
     total_pages = books_read['Number of Pages'].sum()
     avg_pages = total_books > 0 and total_pages / total_books or 0
     avg_rating = books_read['My Rating'][books_read['My Rating'] > 0].mean() or 0
     series_counts = books_read[books_read['Series'].notna()].groupby('Series').size().to_dict()
-    books_2025 = len(books_read[books_read['Date Read'].dt.year == 2025])
 
     # Define columns for all books
     columns = [
@@ -25,36 +58,28 @@ def generate_stats(df):
         'Exclusive Shelf', 'ISBN', 'ISBN13', 'Cover URL', 'Genres', 'Annotation'
     ]
 
-    for col in ['Book Id', 'Author Id']:
+    for col in ['Book Id', 'Author Id', 'Row Hash']:
         if col in df.columns:
             columns.append(col)
 
-    # Prepare full book list
+    # Prepare full book list with column-wise operations only
     book_list = df[columns].copy()
-    book_list['Date Read'] = book_list['Date Read'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else None)
-    book_list['Date Added'] = book_list['Date Added'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else None)
-    book_list['Series'] = book_list['Series'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['Bookshelves'] = book_list['Bookshelves'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['Bookshelves with positions'] = book_list['Bookshelves with positions'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['Exclusive Shelf'] = book_list['Exclusive Shelf'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['ISBN'] = book_list['ISBN'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['ISBN13'] = book_list['ISBN13'].apply(lambda x: x if pd.notna(x) else None)
-    book_list['Cover URL'] = book_list['Cover URL'].apply(lambda x: x if pd.notna(x) and x != 'None' else None)
-    book_list['Genres'] = book_list['Genres'].apply(lambda x: x if x is not None else [])
-    book_list['Annotation'] = book_list['Annotation'].apply(lambda x: x if x is not None else None)
-    book_list['Days Spent'] = book_list.apply(
-        lambda row: int((pd.to_datetime(row['Date Read']) - pd.to_datetime(row['Date Added'])).days)
-        if pd.notna(row['Date Read']) and pd.notna(row['Date Added']) else None,
-        axis=1
-    )
+    book_list['Date Read'] = df['Date Read'].dt.strftime('%Y-%m-%d')
+    book_list['Date Added'] = df['Date Added'].dt.strftime('%Y-%m-%d')
+    book_list['Cover URL'] = book_list['Cover URL'].where(book_list['Cover URL'] != 'None')
     for col in ['Book Id', 'Author Id']:
         if col in book_list.columns:
-            book_list[col] = book_list[col].apply(lambda x: str(x) if pd.notna(x) else None)
-    book_list = book_list.replace({pd.NA: None, float('nan'): None}).to_dict(orient='records')
+            book_list[col] = book_list[col].astype('string')
+    book_list['Days Spent'] = (df['Date Read'] - df['Date Added']).dt.days.astype('Int64')
+    # Missing values of any kind (NaN, NaT, pd.NA) become None; Genres default to an empty list
+    book_list = book_list.astype(object).where(book_list.notna(), None)
+    book_list['Genres'] = [genres if genres is not None else [] for genres in book_list['Genres']]
+    # Build records from native column lists; faster than to_dict(orient='records') boxing every cell
+    book_columns = list(book_list.columns)
+    book_list = [dict(zip(book_columns, values)) for values in zip(*(book_list[col].tolist() for col in book_columns))]
 
     timeline = books_read.groupby(books_read['Date Read'].dt.to_period('M')).size().reset_index(name='Books')
-    timeline['Date'] = timeline['Date Read'].apply(lambda x: x.strftime('%Y-%m') if pd.notna(x) else None)
-    timeline = timeline.dropna(subset=['Date'])
+    timeline['Date'] = timeline['Date Read'].dt.strftime('%Y-%m')
     timeline_data = timeline[['Date', 'Books']].to_dict(orient='records')
 
     stats = {
@@ -63,14 +88,95 @@ def generate_stats(df):
         'avg_pages': round(float(avg_pages), 1),
         'avg_rating': round(float(avg_rating), 2),
         'series_counts': {k: int(v) for k, v in series_counts.items()},
-        'books_2025': int(books_2025),
         'book_list': book_list,
         'timeline': timeline_data,
         'longest_book': books_read.loc[books_read['Number of Pages'].idxmax(), ['Title', 'Number of Pages']].to_dict() if not books_read.empty else {'Title': 'Нет данных', 'Number of Pages': 0},
         'shortest_book': books_read.loc[books_read['Number of Pages'].idxmin(), ['Title', 'Number of Pages']].to_dict() if not books_read.empty else {'Title': 'Нет данных', 'Number of Pages': 0}
     }
+    stats.update(build_aggregates(df))
+    return stats
+
+def split_stats(stats):
+    """Split full stats into a summary with card fields and shards: annotations, and per-shelf details.
+
+    Returns (summary, {shard name: payload}); book_list positions are the join key.
+    """
+    book_list = stats['book_list']
+    summary = {key: value for key, value in stats.items() if key != 'book_list'}
+    summary['book_list'] = [{field: book.get(field) for field in CARD_FIELDS} for book in book_list]
+    shards = {'annotations': [book.get('Annotation') for book in book_list]}
+    groups = {shelf: entry['book_indexes'] for shelf, entry in stats.get('shelves', {}).items()}
+    # Books with an empty Exclusive Shelf are in no shelf index but still need their details (e.g. Row Hash)
+    shelved = {index for indexes in groups.values() for index in indexes}
+    unshelved = [index for index in range(len(book_list)) if index not in shelved]
+    if unshelved:
+        groups[UNSHELVED] = unshelved
+    for shelf, indexes in groups.items():
+        shards[f"details-{shelf}"] = {
+            str(index): {field: value for field, value in book_list[index].items() if field not in CARD_FIELDS and field != 'Annotation'}
+            for index in indexes
+        }
+    return summary, shards
+
+def _previous_shards(output_path):
+    """Shard paths listed by the summary currently at output_path, or [] if there is none."""
+    try:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return list(json.load(f).get('shards', {}).values())
+    except (OSError, ValueError):
+        return []
+
+def write_stats(stats, output_path='reading_stats.json'):
+    """Write a minified summary to output_path plus content-hashed shards under stats/ next to it."""
+    summary, shards = split_stats(stats)
+    previous = _previous_shards(output_path)
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    shard_dir = os.path.join(os.path.dirname(output_path), SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    manifest = {}
+    for name, payload in shards.items():
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        filename = f"{stem}.{name}.{hashlib.sha1(data).hexdigest()[:10]}.json"
+        atomic_write(os.path.join(shard_dir, filename), data)
+        manifest[name] = f"{SHARD_DIR}/{filename}"
+    summary['shards'] = manifest
+    # Shards are in place before the summary that references them is swapped in
+    atomic_write_json(output_path, summary, separators=(',', ':'))
+
+    # Drop the previous summary's shards that the new one no longer references; other outputs' shards are left alone
+    for path in set(previous) - set(manifest.values()):
+        stale = os.path.join(os.path.dirname(output_path), path)
+        if os.path.exists(stale):
+            os.remove(stale)
+    logging.info(f"Summary written to '{output_path}' with {len(manifest)} shards in '{shard_dir}'")
+
+def load_stats(stats_path='reading_stats.json'):
+    """Read a stats summary and merge its shards back into full book_list records."""
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    shards = stats.pop('shards', None)
+    if not shards:
+        return stats  # Single-file format from before sharding
+    base_dir = os.path.dirname(stats_path)
+    book_list = stats['book_list']
+    for name, path in shards.items():
+        with open(os.path.join(base_dir, path), 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if name == 'annotations':
+            for book, annotation in zip(book_list, payload):
+                book['Annotation'] = annotation
+        else:
+            for index, details in payload.items():
+                book_list[int(index)].update(details)
+    return stats
 
-    with open('reading_stats.json', 'w', encoding='utf-8') as f:
-        json.dump(stats, f, indent=2, ensure_ascii=False)
+def generate_stats(df, output_path='reading_stats.json', author_photo_paths=None):
+    """Generate reading statistics and save them as a summary plus shards.
 
-    logging.info("Stats generated and saved to 'reading_stats.json'")
\ No newline at end of file
+    author_photo_paths ({remote photo url: local thumbnail}) goes into the summary for the dashboard.
+    """
+    stats = build_stats(df)
+    stats['author_photo_paths'] = author_photo_paths or {}
+    write_stats(stats, output_path)
+    logging.info(f"Stats generated and saved to '{output_path}'")
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import urllib.parse
+import requests
+from utils.cache import MISS, cached_lookup, get_cached, isbn_key, title_author_key, title_key
+from utils.http_client import http_get
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def clear_memo():
+    """Forget all per-run resolutions."""
+    with _memo_lock:
+        _memo.clear()
+
+def volume_from_search(data):
+    """Reduce a Google Books volumes search response to the first volume's categories, description and imageLinks."""
+    if data.get('totalItems', 0) > 0 and data.get('items') and data['items'][0].get('volumeInfo'):
+        volume_info = data['items'][0]['volumeInfo']
+        return {
+            'categories': volume_info.get('categories', []),
+            'description': volume_info.get('description'),
+            'imageLinks': volume_info.get('imageLinks', {})
+        }
+    return None
+
+def fetch_google_volume(cache_key, query):
+    """Return the first Google Books volumeInfo (categories, description, imageLinks) for a query.
+
+    Results, including "no items" misses, are cached on disk under cache_key.
+    Raises requests.RequestException on network or HTTP errors.
+    """
+    def fetch():
+        url = f"https://www.googleapis.com/books/v1/volumes?q={query}"
+        api_key = os.environ.get('GOOGLE_BOOKS_API_KEY')
+        if api_key:
+            url += f"&key={api_key}"
+        response = http_get(url, timeout=10)
+        response.raise_for_status()
+        return volume_from_search(response.json())
+    return cached_lookup('google_books', [cache_key], fetch)
+
+def title_author_query(title, author):
+    """Google Books query string for a title by a given author."""
+    return f"{urllib.parse.quote(title)}+inauthor:{urllib.parse.quote(author.strip())}"
+
+def _candidate_queries(isbn, isbn13, title, author, additional_authors, require=None):
+    """Yield (source, cache key, query) triples in resolution order."""
+    isbn_keys = [key for key in [isbn_key(isbn13), isbn_key(isbn)] if key]
+    for key in isbn_keys:
+        yield 'google_books', key, key  # the normalized key "isbn:<digits>" is also the query
+    if require == 'thumbnail':
+        # Covers from the bulk Open Library prefetch (utils.bulk_lookup) are free to check
+        for key in isbn_keys:
+            yield 'open_library', key, None
+    if title and author:
+        yield 'google_books', title_author_key(title, author), title_author_query(title, author)
+    add_author = additional_authors.split(',')[0].strip() if isinstance(additional_authors, str) else ''
+    if title and add_author:
+        yield 'google_books', title_author_key(title, add_author), title_author_query(title, add_author)
+        # Broad title search only as a last resort for books with a co-author/translator listed
+        yield 'google_books', title_key(title), urllib.parse.quote(title)
+
+def resolve_volume(isbn, isbn13, title, author, additional_authors, require=None):
+    """Resolve a book to one Google Books volumeInfo: ISBN13, ISBN, title+author, additional author, broad title.
+
+    With require='thumbnail' the chain continues past volumes without a cover thumbnail and
+    also considers prefetched Open Library records. Results are memoized for the run, so
+    genres, annotation and cover lookups share one resolution.
+    """
+    candidates = [c for c in _candidate_queries(isbn, isbn13, title, author, additional_authors, require) if c[1]]
+    memo_key = (tuple(key for _, key, _ in candidates), require)
+    with _memo_lock:
+        if memo_key in _memo:
+            return _memo[memo_key]
+
+    volume = None
+    for source, cache_key, query in candidates:
+        if source == 'open_library':
+            candidate = get_cached(source, cache_key)
+            candidate = None if candidate is MISS else candidate
+        else:
+            try:
+                candidate = fetch_google_volume(cache_key, query)
+            except requests.RequestException as e:
+                logging.error(f"Error resolving {title} via Google Books ({cache_key}): {e}")
+                continue
+        if candidate and (require is None or candidate.get('imageLinks', {}).get(require)):
+            logging.info(f"Resolved {title} via {source} ({cache_key})")
+            volume = candidate
+            break
+
+    with _memo_lock:
+        _memo[memo_key] = volume
+    return volume